@@ -1,6 +1,9 @@
 import resource
 
 import executor_config
+import merging
+import parallel
+import telemetry as step_telemetry
 import angr
 import sys
 import pyvex
@@ -111,39 +114,60 @@ class Executor(object):
 
         sm = self.project.factory.simgr(state, veritesting=veritesting, veritesting_options={'boundaries': _boundaries}, save_unsat=False)
 
+        # merge states at the same address when it is cheap enough
+        self.merging = None
+        if 'merge_cost_threshold' in data:
+            self.merging = merging.CostAwareMerging(data['merge_cost_threshold'], verbose=verbose)
+            sm.use_technique(self.merging)
+            if verbose:
+                print "Merge cost threshold: " + str(data['merge_cost_threshold'])
+
         return sm, data, veritesting, max_rounds
 
-    def run(self, mem_memory = None, reg_memory = None, verbose=True):
+    def run(self, mem_memory = None, reg_memory = None, verbose=True, telemetry=None):
+        """
+        :param telemetry: file name (or file object) where a JSON record is written after each step
+        """
 
         #mem_memory.verbose = False
         #reg_memory.verbose = False
         pg, data, veritesting, max_rounds = self._common_run(mem_memory, reg_memory, verbose)
 
-        k = 0
-        while len(pg.active) > 0:
+        tm = step_telemetry.Telemetry(telemetry) if telemetry is not None else None
 
-            if max_rounds is not None and k >= max_rounds:
-                break
+        try:
+            k = 0
+            while len(pg.active) > 0:
 
-            k += 1
+                if max_rounds is not None and k >= max_rounds:
+                    break
 
-            #print pg
+                k += 1
 
-            #assert len(pg.active) == 1
-            #print str(k) + "\t" + hex(pg.active[0].state.ip.args[0])
+                #print pg
 
-            # step 1 basic block for each active path
-            # if veritesting is on: this will step more than one 1 BB!
+                #assert len(pg.active) == 1
+                #print str(k) + "\t" + hex(pg.active[0].state.ip.args[0])
 
-            if verbose:
-                sys.stdout.write("depth=" + str(k) + " ")
-                print pg
+                # step 1 basic block for each active path
+                # if veritesting is on: this will step more than one 1 BB!
 
-            pg.explore(avoid=self.avoid, find=self.end, n=1)
+                if verbose:
+                    sys.stdout.write("depth=" + str(k) + " ")
+                    print pg
 
-            # Bazinga!
-            if len(pg.found) > 0:
-                break
+                pg.explore(avoid=self.avoid, find=self.end, n=1)
+
+                if tm is not None:
+                    tm.record(k, pg, self.merging)
+
+                # Bazinga!
+                if len(pg.found) > 0:
+                    break
+
+        finally:
+            if tm is not None:
+                tm.close()
 
         if len(pg.found) > 0:
             if verbose:
@@ -164,6 +188,33 @@ class Executor(object):
         return len(pg.found) > 0
 
 
+    def run_parallel(self, mem_memory = None, reg_memory = None, verbose=True, workers=None):
+        """
+        Like run, but active states are stepped by a pool of forked worker processes
+        :param workers: number of workers (default: number of CPUs)
+        """
+        pg, data, veritesting, max_rounds = self._common_run(mem_memory, reg_memory, verbose)
+
+        explorer = parallel.ParallelExplorer(self, workers=workers, verbose=verbose)
+        found = explorer.run(pg, veritesting, max_rounds)
+
+        if len(found) > 0:
+            pg.stashes.setdefault('found', []).extend(found)
+            if verbose:
+                print "Reached the target"
+                print pg
+            state = found[0]
+            self.config.do_end(state, data, pg, verbose)
+        else:
+            if verbose:
+                print "No state has reached the target"
+
+        if verbose:
+            print
+            print "Memory footprint: \t" + str(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024) + " MB"
+
+        return len(found) > 0
+
     def explore(self, mem_memory = None, reg_memory = None):
 
         sm, data, veritesting, max_rounds = self._common_run(mem_memory, reg_memory)
@@ -0,0 +1,70 @@
+import angr
+
+
+class CostAwareMerging(angr.exploration_techniques.ExplorationTechnique):
+    """
+    After each step, merge the states of a stash that are at the same
+    address, but only if the estimated cost of the merged memory
+    (SymbolicMemory.merge_cost) is not over a threshold: otherwise the
+    states are kept separate, since loads on the merged memory could be
+    slower than exploring them one by one.
+    """
+
+    def __init__(self, threshold, verbose=False):
+        super(CostAwareMerging, self).__init__()
+        self.threshold = threshold
+        self.verbose = verbose
+        self.merged = 0
+        self.refused = 0
+
+    def step(self, simgr, stash, **kwargs):
+
+        simgr = simgr.step(stash=stash, **kwargs)
+
+        groups = {}
+        for s in simgr.stashes[stash]:
+            groups.setdefault(s.addr, []).append(s)
+
+        for addr, states in groups.items():
+
+            if len(states) < 2 or not hasattr(states[0].memory, 'merge_cost'):
+                continue
+
+            ancestor = states[0].history
+            for s in states[1:]:
+                if ancestor is None:
+                    break
+                ancestor = ancestor.closest_common_ancestor(s.history)
+
+            if ancestor is None:
+                continue
+
+            cost = states[0].memory.merge_cost([s.memory for s in states[1:]], ancestor)
+
+            if cost > self.threshold:
+                if self.verbose:
+                    print "Not merging " + str(len(states)) + " states at " + hex(addr) + ": cost=" + str(cost)
+                self.refused += 1
+                continue
+
+            if self.verbose:
+                print "Merging " + str(len(states)) + " states at " + hex(addr) + ": cost=" + str(cost)
+
+            ids = set(id(s) for s in states)
+            simgr.move(stash, 'merging', lambda s: id(s) in ids)
+            simgr.merge(merge_func=self._merge_func(ancestor), stash='merging')
+            simgr.move('merging', stash)
+            self.merged += 1
+
+        return simgr
+
+    @staticmethod
+    def _merge_func(ancestor):
+        # without a state hierarchy, SimulationManager.merge does not know
+        # the common ancestor, which the memory needs to find what changed
+        def merge_func(*states):
+            conditions = [s.history.constraints_since(ancestor) for s in states]
+            merged, _, _ = states[0].merge(*states[1:], merge_conditions=conditions,
+                                           common_ancestor_history=ancestor)
+            return merged
+        return merge_func
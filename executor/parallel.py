@@ -0,0 +1,256 @@
+import Queue
+import multiprocessing
+import time
+import traceback
+
+from memory.lib import serialization
+
+
+class StateSerializer(serialization.BatchSerializer):
+    """
+    Pickle a list of states to move them between processes forked from the
+    same parent. Objects that every process inherits through fork (the
+    project, its loader and arch, the binary image and the backers of the
+    memory) are not pickled: they are referenced by their index in a
+    table of shared objects, built before forking.
+    """
+
+    @staticmethod
+    def shared_objects(project, state):
+        """
+        Objects of the project and of the memory plugins of state that are inherited through fork
+        :rtype: list
+        """
+        objs = [project, project.loader, project.loader.memory, project.arch, project.factory]
+        for name in ('memory', 'registers'):
+            plugin = getattr(state, name, None)
+            for attr in ('_image', '_memory_backer', '_permissions_backer'):
+                o = getattr(plugin, attr, None)
+                if o is not None:
+                    objs.append(o)
+        return objs
+
+
+class ParallelExplorer(object):
+    """
+    Explore with a pool of forked worker processes. Each worker steps its
+    own states (as Executor.run does, one round at a time) and sends back
+    the states that reach a target. A worker that runs out of states asks
+    the coordinator for work, which asks the most loaded worker to give
+    away half of its active states (work stealing). Exploration ends when
+    a target is reached (stop_on_found) or when all workers are idle.
+    A worker that fails (an exception, or its process died) stops the
+    exploration: a RuntimeError is raised with its traceback.
+
+    States are not merged across workers. max_rounds bounds the rounds of
+    each worker.
+    """
+
+    def __init__(self, executor, workers=None, stop_on_found=True, verbose=False):
+        self.executor = executor
+        self.project = executor.project
+        self.workers = workers if workers is not None else multiprocessing.cpu_count()
+        self.stop_on_found = stop_on_found
+        self.verbose = verbose
+
+        self.found = []
+        self.stats = {}
+
+    def _simgr(self, states):
+        return self.project.factory.simgr(states, veritesting=self._veritesting,
+                                          veritesting_options={'boundaries': self._boundaries}, save_unsat=False)
+
+    def run(self, sm, veritesting=False, max_rounds=None):
+        """
+        Explore from the active states of sm. They are moved to the workers:
+        when exploration ends, the states still active in the workers are
+        dropped, and so is the active stash of sm.
+        :rtype: list of SimState (found states)
+        """
+        self._veritesting = veritesting
+        self._boundaries = list(self.executor.end) if veritesting else []
+        self._max_rounds = max_rounds
+
+        states = list(sm.active)
+        if len(states) == 0:
+            return []
+
+        self._serializer = StateSerializer(StateSerializer.shared_objects(self.project, states[0]))
+
+        outbox = multiprocessing.Queue()
+        inboxes = [multiprocessing.Queue() for _ in range(self.workers)]
+        processes = [multiprocessing.Process(target=self._worker, args=(w, inboxes[w], outbox))
+                     for w in range(self.workers)]
+        for p in processes:
+            p.daemon = True
+            p.start()
+
+        # initial partition of the frontier
+        idle = set()
+        for w in range(self.workers):
+            part = states[w::self.workers]
+            if len(part) > 0:
+                inboxes[w].put(('work', self._serializer.dumps(part)))
+            else:
+                idle.add(w)
+
+        try:
+            self._coordinate(inboxes, outbox, idle, processes)
+        finally:
+            for inbox in inboxes:
+                inbox.put(('stop',))
+            self._wait(processes, outbox)
+
+        sm.drop(stash='active')
+        return self.found
+
+    def _coordinate(self, inboxes, outbox, idle, processes):
+
+        loads = dict((w, 0) for w in range(self.workers))
+        pending = set()  # idle workers with a steal request in flight
+
+        while True:
+
+            try:
+                msg = outbox.get(timeout=1)
+            except Queue.Empty:
+                # workers only exit when stopped: a dead worker has failed
+                for w, p in enumerate(processes):
+                    if not p.is_alive():
+                        raise RuntimeError("Worker " + str(w) + " died (exit code " + str(p.exitcode) + ")")
+                continue
+
+            kind = msg[0]
+
+            if kind == 'error':
+                raise RuntimeError("Worker " + str(msg[1]) + " failed:\n" + msg[2])
+
+            elif kind == 'load':
+                loads[msg[1]] = msg[2]
+
+            elif kind == 'idle':
+                idle.add(msg[1])
+                loads[msg[1]] = 0
+
+            elif kind == 'give':
+                thief, data = msg[1], msg[2]
+                pending.discard(thief)
+                if data is not None:
+                    idle.discard(thief)
+                    loads[thief] = msg[3]
+                    inboxes[thief].put(('work', data))
+
+            elif kind == 'found':
+                self.found += self._serializer.loads(msg[2])
+                if self.verbose:
+                    print "Worker " + str(msg[1]) + " reached the target"
+                if self.stop_on_found:
+                    return
+
+            # idle workers steal from the most loaded ones
+            for thief in idle - pending:
+                victims = [w for w in range(self.workers) if w not in idle and loads[w] > 1]
+                if len(victims) == 0:
+                    break
+                victim = max(victims, key=lambda w: loads[w])
+                loads[victim] -= loads[victim] / 2
+                pending.add(thief)
+                inboxes[victim].put(('steal', thief))
+
+            if len(idle) == self.workers and len(pending) == 0:
+                return
+
+    def _wait(self, processes, outbox, timeout=30):
+
+        done = set()  # workers that have stopped, or failed
+        deadline = time.time() + timeout
+        while len(done) < len(processes) and time.time() < deadline:
+            try:
+                msg = outbox.get(timeout=1)
+            except Queue.Empty:
+                if not any(p.is_alive() for p in processes):
+                    break
+                continue
+            if msg[0] == 'done':
+                done.add(msg[1])
+                self.stats[msg[1]] = msg[2]
+            elif msg[0] == 'error':
+                done.add(msg[1])
+
+        for p in processes:
+            p.join(1)
+            if p.is_alive():
+                p.terminate()
+
+        if self.verbose:
+            for w in sorted(self.stats):
+                print "Worker " + str(w) + ": " + str(self.stats[w])
+
+    def _step(self, sm):
+        sm.explore(avoid=self.executor.avoid, find=self.executor.end, n=1)
+
+    def _worker(self, w, inbox, outbox):
+        try:
+            self._work(w, inbox, outbox)
+        except Exception:
+            outbox.put(('error', w, traceback.format_exc()))
+
+    def _work(self, w, inbox, outbox):
+
+        stats = {'rounds': 0, 'given': 0, 'received': 0, 'found': 0, 'avoid': 0, 'deadended': 0}
+        sm = self._simgr([])
+        stop = False
+
+        while not stop:
+
+            # serve messages: wait for one if there is nothing to step
+            while not stop:
+                try:
+                    msg = inbox.get(block=len(sm.active) == 0)
+                except Queue.Empty:
+                    break
+
+                if msg[0] == 'stop':
+                    stop = True
+
+                elif msg[0] == 'work':
+                    states = self._serializer.loads(msg[1])
+                    stats['received'] += len(states)
+                    sm.stashes['active'].extend(states)
+
+                elif msg[0] == 'steal':
+                    active = sm.active
+                    n = len(active) / 2
+                    if n == 0:
+                        outbox.put(('give', msg[1], None, 0))
+                    else:
+                        give = active[len(active) - n:]
+                        ids = set(id(s) for s in give)
+                        sm.drop(filter_func=lambda s: id(s) in ids, stash='active')
+                        stats['given'] += n
+                        outbox.put(('give', msg[1], self._serializer.dumps(give), n))
+
+            if stop or len(sm.active) == 0:
+                continue
+
+            if self._max_rounds is not None and stats['rounds'] >= self._max_rounds:
+                sm.drop(stash='active')
+            else:
+                stats['rounds'] += 1
+                self._step(sm)
+
+            for s in sm.stashes.get('found', []):
+                outbox.put(('found', w, self._serializer.dumps([s])))
+                stats['found'] += 1
+
+            stats['avoid'] += len(sm.stashes.get('avoid', []))
+            stats['deadended'] += len(sm.stashes.get('deadended', []))
+            for stash in ('found', 'avoid', 'deadended'):
+                sm.drop(stash=stash)
+
+            if len(sm.active) == 0:
+                outbox.put(('idle', w))
+            else:
+                outbox.put(('load', w, len(sm.active)))
+
+        outbox.put(('done', w, stats))
@@ -0,0 +1,67 @@
+import json
+import resource
+import time
+
+from memory.lib import solver_stats
+
+
+def _rss():
+    # current resident set size, in bytes (Linux), None elsewhere
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (IOError, ValueError, IndexError):
+        return None
+
+
+class Telemetry(object):
+    """
+    One JSON record for each exploration step, written to a file:
+    stash sizes, size of the memory of each active state, cumulative
+    solver time (when solver_stats is enabled), merges and RSS.
+    Only counters are read: no memory or solver content is visited.
+    """
+
+    def __init__(self, out):
+        if isinstance(out, basestring):
+            self._out = open(out, 'w')
+            self._close = True
+        else:
+            self._out = out
+            self._close = False
+        self._start = time.time()
+        self._last = self._start
+
+    def record(self, step, pg, merging=None):
+
+        now = time.time()
+
+        states = []
+        for s in pg.active:
+            r = {'addr': s.addr}
+            if hasattr(s.memory, 'telemetry'):
+                r.update(s.memory.telemetry())
+            states.append(r)
+
+        record = {
+            'step': step,
+            'time': now - self._start,
+            'step_time': now - self._last,
+            'active': len(pg.active),
+            'found': len(pg.stashes.get('found', [])),
+            'avoid': len(pg.stashes.get('avoid', [])),
+            'states': states,
+            'solver_time': sum(s[2] for s in solver_stats.operations().values()) if solver_stats.is_enabled() else None,
+            'merged': merging.merged if merging is not None else None,
+            'merge_refused': merging.refused if merging is not None else None,
+            'rss': _rss(),
+            'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        }
+
+        self._last = now
+        self._out.write(json.dumps(record) + "\n")
+        self._out.flush()
+
+    def close(self):
+        if self._close:
+            self._out.close()
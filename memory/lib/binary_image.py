@@ -0,0 +1,80 @@
+import bisect
+import mmap
+import tempfile
+
+
+class BinaryImage(object):
+    """
+    Initial content of the memory, i.e., the segments of the binary.
+
+    Segments are written once to an unlinked temporary file, which is then
+    mapped read-only: all states share the same view and forked worker
+    processes share its physical pages with their parent.
+    """
+
+    PAGE_SIZE = 0x1000
+
+    def __init__(self, segments):
+        """
+        :param segments: iterable of (addr, data) where data is a str. Where
+                         segments overlap, the one starting first (or, at the
+                         same address, given first) wins.
+        """
+        self._starts = []
+        self._ends = []
+        self._offsets = []
+
+        f = tempfile.TemporaryFile()
+        offset = 0
+        for addr, data in sorted(segments, key=lambda s: s[0]):
+            if len(self._ends) > 0 and addr < self._ends[-1]:
+                # overlap: keep only the part after the previous segment
+                data = data[self._ends[-1] - addr:]
+                addr = self._ends[-1]
+            if len(data) == 0:
+                continue
+            f.write(data)
+            self._starts.append(addr)
+            self._ends.append(addr + len(data))
+            self._offsets.append(offset)
+            offset += len(data)
+        f.flush()
+
+        self._view = mmap.mmap(f.fileno(), offset, access=mmap.ACCESS_READ) if offset > 0 else None
+        f.close()
+
+    def read(self, addr, size):
+        """
+        Get the chunks of the image within [addr, addr + size)
+        :rtype: list of (addr, str)
+        """
+        end = addr + size
+        k = max(0, bisect.bisect_right(self._starts, addr) - 1)
+        res = []
+        while k < len(self._starts) and self._starts[k] < end:
+            a = max(addr, self._starts[k])
+            b = min(end, self._ends[k])
+            if a < b:
+                o = self._offsets[k] + a - self._starts[k]
+                res.append((a, self._view[o:o + b - a]))
+            k += 1
+        return res
+
+    def page_indexes(self, first, last):
+        """
+        Get indexes of pages within [first, last] that have some initial content
+        :rtype: list of int
+        """
+        res = []
+        k = max(0, bisect.bisect_right(self._starts, first * self.PAGE_SIZE) - 1)
+        while k < len(self._starts) and self._starts[k] / self.PAGE_SIZE <= last:
+            a = max(first, self._starts[k] / self.PAGE_SIZE)
+            b = min(last, (self._ends[k] - 1) / self.PAGE_SIZE)
+            for index in range(a, b + 1):
+                if len(res) == 0 or res[-1] < index:
+                    res.append(index)
+            k += 1
+        return res
+
+    def __len__(self):
+        return len(self._view) if self._view is not None else 0
@@ -0,0 +1,68 @@
+"""
+guards: interning of merge guards
+
+A guard built by merges is a conjunction of conditions. Instead of
+nesting And(And(g, c1), c2), the conjuncts are flattened, deduplicated
+and sorted (by hash) so that the same set of conditions always gives
+the same AST object, whatever the order of the merges. A table is shared
+by a memory and all its copies.
+"""
+
+import claripy
+
+
+class GuardTable(object):
+
+    def __init__(self, max_guards=8192):
+        self._max_guards = max_guards
+        self._guards = {}  # tuple of sorted conjunct hashes -> guard
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _conjuncts(guard, res):
+        if guard.op == 'And':
+            for a in guard.args:
+                GuardTable._conjuncts(a, res)
+        elif not guard.is_true():
+            res[hash(guard)] = guard
+
+    def conjunction(self, *guards):
+        """
+        Get the interned guard for the conjunction of guards (None is true)
+        :rtype: claripy.ast.Bool
+        """
+        conjuncts = {}
+        for g in guards:
+            if g is not None:
+                self._conjuncts(g, conjuncts)
+
+        if len(conjuncts) == 0:
+            return None
+
+        key = tuple(sorted(conjuncts.keys()))
+        guard = self._guards.get(key)
+        if guard is not None:
+            self.hits += 1
+            return guard
+
+        self.misses += 1
+        if len(conjuncts) == 1:
+            guard = conjuncts[key[0]]
+        else:
+            guard = claripy.And(*[conjuncts[h] for h in key])
+
+        if len(self._guards) >= self._max_guards:
+            self._guards = {}
+        self._guards[key] = guard
+        return guard
+
+    def __len__(self):
+        return len(self._guards)
+
+    def __getstate__(self):
+        # guards are not pickled: the table is rebuilt empty, still shared by the memories that shared it
+        return {'_max_guards': self._max_guards}
+
+    def __setstate__(self, d):
+        self.__init__(d['_max_guards'])
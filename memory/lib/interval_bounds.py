@@ -0,0 +1,182 @@
+"""
+interval_bounds: cheap bounds of bitvector expressions
+
+A plain interval analysis over claripy ASTs: it over-approximates the
+unsigned values that an expression can take, with no solver call. Leaves
+are bounded by their width, or by constraints of the form
+`e OP constant` (OP being an unsigned comparison or an equality) that
+are in the constraint set. Any operation that could wrap around, or that
+is not handled, gives the full range of its width.
+
+Typical use: `base + (ZeroExt(i) << k)` with `i < n` in the constraints.
+"""
+
+_CMP_OPS = {
+    'ULT': 'ULT', '__lt__': 'ULT',
+    'ULE': 'ULE', '__le__': 'ULE',
+    'UGT': 'UGT', '__gt__': 'UGT',
+    'UGE': 'UGE', '__ge__': 'UGE',
+    '__eq__': 'EQ',
+}
+
+# comparison with swapped operands: c OP e => e MIRROR[OP] c
+_MIRROR = {'ULT': 'UGT', 'ULE': 'UGE', 'UGT': 'ULT', 'UGE': 'ULE', 'EQ': 'EQ'}
+
+
+def _full(bits):
+    return 0, (1 << bits) - 1
+
+
+def full_range(e):
+    """
+    Interval of all the values of e, i.e., no bound at all
+    :rtype: (int, int)
+    """
+    return _full(e.size())
+
+
+def _refine(known, e, op, c):
+    lo, hi = known.get(hash(e), _full(e.size()))
+    if op == 'ULT':
+        hi = min(hi, c - 1)
+    elif op == 'ULE':
+        hi = min(hi, c)
+    elif op == 'UGT':
+        lo = max(lo, c + 1)
+    elif op == 'UGE':
+        lo = max(lo, c)
+    else:
+        lo = max(lo, c)
+        hi = min(hi, c)
+    if lo <= hi:
+        known[hash(e)] = (lo, hi)
+
+
+def constraint_bounds(constraints):
+    """
+    Collect bounds of expressions compared with a constant
+    :rtype: dict of hash(expr) -> (int, int)
+    """
+    known = {}
+    stack = list(constraints)
+    while stack != []:
+        c = stack.pop()
+        if c.op == 'And':
+            stack += c.args
+            continue
+        op = _CMP_OPS.get(c.op)
+        if op is None or len(c.args) != 2:
+            continue
+        l, r = c.args
+        if r.op == 'BVV' and l.op != 'BVV':
+            _refine(known, l, op, r.args[0])
+        elif l.op == 'BVV' and r.op != 'BVV':
+            _refine(known, r, _MIRROR[op], l.args[0])
+    return known
+
+
+def bounds(e, known, cache=None):
+    """
+    Get an interval [lo, hi] containing all the (unsigned) values of e
+    :rtype: (int, int)
+    """
+    if cache is None:
+        cache = {}
+
+    h = hash(e)
+    r = cache.get(h)
+    if r is not None:
+        return r
+
+    bits = e.size()
+    r = _bounds(e, bits, known, cache)
+    if r is None or r[1] > (1 << bits) - 1:
+        r = _full(bits)
+
+    if h in known:
+        lo, hi = known[h]
+        if max(lo, r[0]) <= min(hi, r[1]):
+            r = max(lo, r[0]), min(hi, r[1])
+
+    cache[h] = r
+    return r
+
+
+def _bounds(e, bits, known, cache):
+
+    op = e.op
+
+    if op == 'BVV':
+        return e.args[0], e.args[0]
+
+    if op == 'BVS':
+        return None
+
+    if op == '__add__':
+        lo, hi = 0, 0
+        for a in e.args:
+            a_lo, a_hi = bounds(a, known, cache)
+            lo += a_lo
+            hi += a_hi
+        return lo, hi
+
+    if op == '__sub__' and len(e.args) == 2:
+        a_lo, a_hi = bounds(e.args[0], known, cache)
+        b_lo, b_hi = bounds(e.args[1], known, cache)
+        if a_lo < b_hi:
+            return None
+        return a_lo - b_hi, a_hi - b_lo
+
+    if op == '__mul__':
+        lo, hi = 1, 1
+        for a in e.args:
+            a_lo, a_hi = bounds(a, known, cache)
+            lo *= a_lo
+            hi *= a_hi
+        return lo, hi
+
+    if op == '__lshift__' and e.args[1].op == 'BVV':
+        k = e.args[1].args[0]
+        lo, hi = bounds(e.args[0], known, cache)
+        return lo << k, hi << k
+
+    if op == 'LShR' and e.args[1].op == 'BVV':
+        k = e.args[1].args[0]
+        lo, hi = bounds(e.args[0], known, cache)
+        return lo >> k, hi >> k
+
+    if op == '__and__':
+        hi = min(bounds(a, known, cache)[1] for a in e.args)
+        return 0, hi
+
+    if op == 'ZeroExt':
+        return bounds(e.args[1], known, cache)
+
+    if op == 'SignExt':
+        x = e.args[1]
+        lo, hi = bounds(x, known, cache)
+        if hi >= 1 << (x.size() - 1):
+            return None
+        return lo, hi
+
+    if op == 'Extract':
+        high, low, x = e.args
+        lo, hi = bounds(x, known, cache)
+        if hi >= 1 << (high + 1):
+            return None
+        return lo >> low, hi >> low
+
+    if op == 'Concat':
+        lo, hi = 0, 0
+        for a in e.args:
+            a_lo, a_hi = bounds(a, known, cache)
+            lo = (lo << a.size()) | a_lo
+            hi = (hi << a.size()) | a_hi
+        return lo, hi
+
+    if op == 'If':
+        a_lo, a_hi = bounds(e.args[1], known, cache)
+        b_lo, b_hi = bounds(e.args[2], known, cache)
+        return min(a_lo, b_lo), max(a_hi, b_hi)
+
+    return None
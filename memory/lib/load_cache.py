@@ -0,0 +1,140 @@
+"""
+load_cache: memoization of loads
+
+Maps (address, size) to the data returned by a previous load. An entry
+remains valid until a store (explicit or implicit) overlaps the range of
+addresses [min_addr, max_addr + size) that the load could read, hence
+entries are indexed by the pages of this range, and every store drops the
+entries it overlaps: no timestamp is needed to check a hit.
+
+copy() is O(1): the two caches share their tables. The first write by
+either side (an add, or an invalidation that drops some entry) copies
+them, which is O(number of entries), at most max_entries. A child state
+thus inherits the entries of its parent: since constraints only grow
+along a path, data built for a wider range of addresses is still valid
+in the child.
+"""
+
+PAGE_BITS = 12
+
+
+class LoadCacheEntry(object):
+    __slots__ = ('min_addr', 'max_addr', 'size', 'data')
+
+    def __init__(self, min_addr, max_addr, size, data):
+        self.min_addr = min_addr
+        self.max_addr = max_addr
+        self.size = size
+        self.data = data
+
+    def __repr__(self):
+        return "[" + hex(self.min_addr) + ", " + hex(self.max_addr + self.size) + ")"
+
+
+class LoadCache(object):
+
+    # entries whose range spans more pages than this are not cached
+    MAX_PAGES = 16
+
+    def __init__(self, max_entries=4096, entries=None, pages=None):
+        self._max_entries = max_entries
+        self._entries = entries if entries is not None else {}  # key -> LoadCacheEntry
+        self._pages = pages if pages is not None else {}  # page index -> set of keys
+        self._lazycopy = entries is not None
+
+    @staticmethod
+    def key(addr, size):
+        # ASTs cannot be dict keys (== builds a new AST): use their hash
+        return (addr if type(addr) in (int, long) else ('ast', hash(addr))), size
+
+    def copy(self):
+        """
+        Copy of the cache - O(1), tables are copied on the first write by either side
+        :rtype: LoadCache
+        """
+        self._lazycopy = True
+        return LoadCache(self._max_entries, self._entries, self._pages)
+
+    def __getstate__(self):
+        # entries are not pickled: the cache is rebuilt empty
+        return {'_max_entries': self._max_entries}
+
+    def __setstate__(self, d):
+        self.__init__(d['_max_entries'])
+
+    def _copy_on_write(self):
+        if self._lazycopy:
+            self._lazycopy = False
+            self._entries = dict(self._entries)
+            self._pages = dict((index, set(keys)) for index, keys in self._pages.items())
+
+    def get(self, key):
+        """
+        :rtype: LoadCacheEntry
+        """
+        return self._entries.get(key)
+
+    def add(self, key, min_addr, max_addr, size, data):
+
+        first = min_addr >> PAGE_BITS
+        last = (max_addr + size - 1) >> PAGE_BITS
+        if last - first >= self.MAX_PAGES:
+            return
+
+        self._copy_on_write()
+
+        if key in self._entries:
+            self._remove(key)
+        elif len(self._entries) >= self._max_entries:
+            self._remove(next(iter(self._entries)))
+
+        self._entries[key] = LoadCacheEntry(min_addr, max_addr, size, data)
+        for index in range(first, last + 1):
+            keys = self._pages.get(index)
+            if keys is None:
+                keys = set()
+                self._pages[index] = keys
+            keys.add(key)
+
+    def _remove(self, key):
+        e = self._entries.pop(key)
+        for index in range(e.min_addr >> PAGE_BITS, ((e.max_addr + e.size - 1) >> PAGE_BITS) + 1):
+            keys = self._pages.get(index)
+            if keys is not None:
+                keys.discard(key)
+                if len(keys) == 0:
+                    del self._pages[index]
+
+    def invalidate(self, begin, end):
+        """
+        Drop entries that could read any address within [begin, end]
+        """
+        if len(self._entries) == 0:
+            return
+
+        first = begin >> PAGE_BITS
+        last = end >> PAGE_BITS
+        if last - first < len(self._pages):
+            indexes = [index for index in range(first, last + 1) if index in self._pages]
+        else:
+            indexes = [index for index in self._pages if first <= index <= last]
+
+        stale = set()
+        for index in indexes:
+            for key in self._pages[index]:
+                e = self._entries[key]
+                if e.min_addr <= end and begin < e.max_addr + e.size:
+                    stale.add(key)
+
+        if len(stale) > 0:
+            self._copy_on_write()
+            for key in stale:
+                self._remove(key)
+
+    def clear(self):
+        self._lazycopy = False
+        self._entries = {}
+        self._pages = {}
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,155 @@
+"""
+page_table: persistent map from page index to page
+
+A hash array mapped trie (HAMT) keyed directly on the page index:
+each level consumes BITS bits of the index. Nodes and entries carry an
+owner token: a table can modify in place only what it owns, anything
+else is copied on write. copy() is O(1): both tables get fresh tokens,
+so the first write to a page copies only the O(log n) nodes on its path.
+"""
+
+BITS  = 5
+WIDTH = 1 << BITS
+MASK  = WIDTH - 1
+
+
+def _popcount(x):
+    return bin(x).count('1')
+
+
+class _Entry(object):
+    __slots__ = ('key', 'value', 'owner')
+
+    def __init__(self, key, value, owner):
+        self.key = key
+        self.value = value
+        self.owner = owner
+
+
+class _Node(object):
+    __slots__ = ('bitmap', 'array', 'owner')
+
+    def __init__(self, bitmap, array, owner):
+        self.bitmap = bitmap
+        self.array = array  # one _Entry or _Node for each bit set in bitmap
+        self.owner = owner
+
+
+class PageTable(object):
+
+    def __init__(self, root=None, count=0):
+        self._owner = object()
+        self._root = root if root is not None else _Node(0, [], self._owner)
+        self._count = count
+
+    def copy(self):
+        """
+        Copy of the table - O(1), nodes and pages are shared until written
+        :rtype: PageTable
+        """
+        self._owner = object()
+        return PageTable(self._root, self._count)
+
+    def _entry(self, key):
+        node = self._root
+        shift = 0
+        while True:
+            bit = 1 << ((key >> shift) & MASK)
+            if not node.bitmap & bit:
+                return None
+            child = node.array[_popcount(node.bitmap & (bit - 1))]
+            if type(child) is _Entry:
+                return child if child.key == key else None
+            node = child
+            shift += BITS
+
+    def get(self, key, default=None):
+        e = self._entry(key)
+        return e.value if e is not None else default
+
+    def is_owned(self, key):
+        """
+        True if the page at key has been set by this table after its last
+        copy, i.e., it is not shared with any other table.
+        """
+        e = self._entry(key)
+        return e is not None and e.owner is self._owner
+
+    def __getitem__(self, key):
+        e = self._entry(key)
+        if e is None:
+            raise KeyError(key)
+        return e.value
+
+    def __contains__(self, key):
+        return self._entry(key) is not None
+
+    def __setitem__(self, key, value):
+
+        node = self._root
+        if node.owner is not self._owner:
+            node = _Node(node.bitmap, list(node.array), self._owner)
+            self._root = node
+
+        shift = 0
+        while True:
+
+            bit = 1 << ((key >> shift) & MASK)
+            pos = _popcount(node.bitmap & (bit - 1))
+
+            if not node.bitmap & bit:
+                node.array.insert(pos, _Entry(key, value, self._owner))
+                node.bitmap |= bit
+                self._count += 1
+                return
+
+            child = node.array[pos]
+
+            if type(child) is _Entry:
+
+                if child.key == key:
+                    if child.owner is self._owner:
+                        child.value = value
+                    else:
+                        node.array[pos] = _Entry(key, value, self._owner)
+                    return
+
+                # collision on this level: push the existing entry one level down
+                shift += BITS
+                sub = _Node(1 << ((child.key >> shift) & MASK), [child], self._owner)
+                node.array[pos] = sub
+                node = sub
+                continue
+
+            if child.owner is not self._owner:
+                child = _Node(child.bitmap, list(child.array), self._owner)
+                node.array[pos] = child
+
+            node = child
+            shift += BITS
+
+    def _entries(self):
+        stack = [self._root]
+        while stack != []:
+            node = stack.pop()
+            for child in node.array:
+                if type(child) is _Entry:
+                    yield child
+                else:
+                    stack.append(child)
+
+    def keys(self):
+        return [e.key for e in self._entries()]
+
+    def values(self):
+        return [e.value for e in self._entries()]
+
+    def items(self):
+        return [(e.key, e.value) for e in self._entries()]
+
+    def __iter__(self):
+        for e in self._entries():
+            yield e.key
+
+    def __len__(self):
+        return self._count
@@ -2,32 +2,234 @@ import bisect
 
 import sys, os
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../'))
+import claripy
 import memory
+import page_table
+from profiling import profile
+
+# one BVV for each byte value, built on first use
+_byte_values = None
+
+def _byte_value(v):
+    global _byte_values
+    if _byte_values is None:
+        _byte_values = [claripy.BVV(k, 8) for k in range(256)]
+    return _byte_values[v]
+
+
+class PageLineage(object):
+    """
+    Offsets written in a page since it was copied from its parent page.
+    A page shared by two memories is never written again (both copy it on
+    write), hence two pages derived from the same page differ at most at
+    the offsets written along their lineages after their common ancestor.
+    """
+    __slots__ = ('parent', 'depth', 'dirty')
+
+    # longer chains are cut: merges then compare every offset
+    MAX_DEPTH = 32
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.dirty = set()
+
+    def __reduce_ex__(self, protocol):
+        # the root is pickled by reference: unpickled pages still have a common ancestor with the others
+        if self is _root_lineage:
+            return '_root_lineage'
+        return object.__reduce_ex__(self, protocol)
+
+# ancestor of every page created from the image
+_root_lineage = PageLineage(None)
+
+
+def changed_offsets(pages):
+    """
+    Get offsets where pages derived from a common page can differ. A None
+    page stands for a page never written, i.e., the content of the image.
+    :rtype: set of int, or None if pages do not have a common ancestor
+    """
+    chains = []
+    for page in pages:
+        chain = []
+        node = page.lineage if page is not None else _root_lineage
+        while node is not None:
+            chain.append(node)
+            node = node.parent
+        chains.append(chain)
+
+    common = set(id(node) for node in chains[0])
+    for chain in chains[1:]:
+        common &= set(id(node) for node in chain)
+    if len(common) == 0:
+        return None
+
+    offsets = set()
+    for chain in chains:
+        for node in chain:
+            if id(node) in common:
+                break
+            offsets |= node.dirty
+    return offsets
+
+
+class ConcretePage(object):
+    """
+    A page of the concrete memory. Bytes that are concrete and unconditional
+    are kept in a bytearray, with a presence bitmap and a dict holding only
+    the non-zero timestamps (most bytes come from the image or from stores
+    at time zero). Any other value (a symbolic or guarded item, or a list of
+    items) is kept in a side dict.
+    Items for concrete bytes are rebuilt when they are accessed.
+    """
+    __slots__ = ('base', '_bytes', '_present', '_timestamps', '_items', 'lineage', '_count')
+
+    SIZE = 0x1000
+
+    def __init__(self, base):
+        self.base = base
+        self._bytes = bytearray(self.SIZE)
+        self._present = bytearray(self.SIZE / 8)
+        self._timestamps = {}
+        self._items = {}
+        self.lineage = PageLineage(_root_lineage)
+        self._count = 0  # number of offsets with a value, None if unknown
+
+    def copy(self):
+        p = ConcretePage(self.base)
+        p.lineage = PageLineage(self.lineage if self.lineage.depth < PageLineage.MAX_DEPTH else None)
+        p._bytes = bytearray(self._bytes)
+        p._present = bytearray(self._present)
+        p._timestamps = dict(self._timestamps)
+        p._items = dict(self._items)
+        p._count = self._count
+        return p
+
+    def _is_present(self, offset):
+        return self._present[offset >> 3] & (1 << (offset & 7))
+
+    @staticmethod
+    def _concrete_byte(value):
+        """
+        Byte value of an item that can be kept in the bytearray, None otherwise
+        """
+        if type(value) in (list,) or value.guard is not None or value.size != 1 \
+                or type(value.addr) not in (int, long):
+            return None
+        obj = value._obj
+        if type(obj) in (list,):
+            data, k = obj
+            if data.op != 'BVV':
+                return None
+            return (data.args[0] >> 8 * (len(data) / 8 - 1 - k)) & 0xFF
+        if type(obj) in (int, long):
+            return obj & 0xFF
+        if obj.op == 'BVV' and len(obj) == 8:
+            return obj.args[0]
+        return None
+
+    def get(self, offset, default=None):
+        if offset in self._items:
+            return self._items[offset]
+        if not self._is_present(offset):
+            return default
+        return memory.range_fully_symbolic_memory.MemoryItem(self.base + offset, _byte_value(self._bytes[offset]),
+                                                              self._timestamps.get(offset, 0), None)
+
+    def __getitem__(self, offset):
+        v = self.get(offset)
+        if v is None:
+            raise KeyError(offset)
+        return v
+
+    def __contains__(self, offset):
+        return offset in self._items or self._is_present(offset)
+
+    def __setitem__(self, offset, value):
+        self._count = None
+        v = self._concrete_byte(value)
+        if v is None:
+            self._items[offset] = value
+            self._present[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+            self._timestamps.pop(offset, None)
+            return
+        self._items.pop(offset, None)
+        self._bytes[offset] = v
+        self._present[offset >> 3] |= 1 << (offset & 7)
+        if value.t != 0:
+            self._timestamps[offset] = value.t
+        else:
+            self._timestamps.pop(offset, None)
 
-def profile(func):
-    def wrap(*args, **kwargs):
-        import time
-        started_at = time.time()
-        result = func(*args, **kwargs)
-        elapsed = time.time() - started_at
-        memory.range_fully_symbolic_memory.update_counter(elapsed, "paged_memory." + func.__name__)
-        return result
+    def __delitem__(self, offset):
+        if offset not in self:
+            raise KeyError(offset)
+        self._count = None
+        self._items.pop(offset, None)
+        self._present[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+        self._timestamps.pop(offset, None)
+
+    def init_bytes(self, offset, data):
+        """
+        Set bytes [offset, offset + len(data)) to data with timestamp zero,
+        skipping offsets that already have a value.
+        """
+        data = bytearray(data)
+        self._count = None
+        if len(self._items) == 0 and not any(self._present):
+            # empty page: copy all bytes at once
+            self._bytes[offset:offset + len(data)] = data
+            for o in range(offset, offset + len(data)):
+                self._present[o >> 3] |= 1 << (o & 7)
+            return
+        for k in range(len(data)):
+            o = offset + k
+            if o not in self._items and not self._is_present(o):
+                self._bytes[o] = data[k]
+                self._present[o >> 3] |= 1 << (o & 7)
+
+    def keys(self):
+        r = self._items.keys()
+        for k in range(len(self._present)):
+            b = self._present[k]
+            if b:
+                for j in range(8):
+                    if b & (1 << j):
+                        r.append((k << 3) + j)
+        return r
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        if self._count is None:
+            self._count = len(self._items) + sum(bin(b).count('1') for b in self._present)
+        return self._count
 
-    return wrap
 
 class PagedMemory(object):
 
-    PAGE_SIZE = 0x1000
+    PAGE_SIZE = ConcretePage.SIZE
 
     ACCESS_EXECUTE  = 0x1
     ACCESS_WRITE    = 0x2
     ACCESS_READ     = 0x4
 
-    def __init__(self, memory, pages=dict()):
-        self._pages = pages
-        self._cowed = set()
+    def __init__(self, memory, pages=None, image=None, count=0):
+        self._pages = page_table.PageTable() if pages is None else pages
         self.memory = memory
 
+        # number of addresses with a value in the pages, kept up to date by writes
+        self._count = count
+
+        # initial content of pages, shared by all memories
+        self.image = image
+
+        # last page known to be owned by this memory
+        self._last_index = None
+        self._last_page = None
+
     def _get_index_offset(self, addr):
         index = addr / self.PAGE_SIZE
         offset = addr % self.PAGE_SIZE
@@ -40,15 +242,43 @@ class PagedMemory(object):
 
         index, offset = self._get_index_offset(addr)
 
-        if index not in self._pages:
-            return None
-
-        page = self._pages[index]
-
-        if offset not in page:
-            return None
+        if index == self._last_index:
+            page = self._last_page
+        else:
+            page = self._pages.get(index)
+            if page is None:
+                # untouched page: the image is the baseline
+                if self.image is not None:
+                    data = self.image.read(addr, 1)
+                    if len(data) > 0:
+                        return self._image_item(addr, data[0][1])
+                return None
+
+        return page.get(offset)
+
+    def _image_item(self, addr, c):
+        return memory.range_fully_symbolic_memory.MemoryItem(addr, _byte_value(ord(c)), 0, None)
+
+    def _get_owned_page(self, index):
+
+        if index == self._last_index:
+            return self._last_page
+
+        page = self._pages.get(index)
+        if page is None:
+            page = ConcretePage(index * self.PAGE_SIZE)
+            if self.image is not None:
+                for addr, data in self.image.read(page.base, self.PAGE_SIZE):
+                    page.init_bytes(addr - page.base, data)
+                self._count += len(page)
+            self._pages[index] = page
+        elif not self._pages.is_owned(index):
+            page = page.copy()
+            self._pages[index] = page
 
-        return page[offset]
+        self._last_index = index
+        self._last_page = page
+        return page
 
     @profile
     def __setitem__(self, addr, value):
@@ -60,149 +290,87 @@ class PagedMemory(object):
 
         #print "storing at index= " + str(index) + " offset=" + str(offset)
 
-        if index not in self._pages:
-            page = dict()
-            self._cowed.add(index)
-            self._pages[index] = page
-        else:
-            page = self._pages[index]
-            if index not in self._cowed:
-                page = dict(page)
-                self._pages[index] = page
-                self._cowed.add(index)
-
+        page = self._get_owned_page(index)
+        if offset not in page:
+            self._count += 1
         page[offset] = value
+        page.lineage.dirty.add(offset)
+
+    def __delitem__(self, addr):
+        index, offset = self._get_index_offset(addr)
+        page = self._pages.get(index)
+        if page is None or offset not in page:
+            raise KeyError(addr)
+        page = self._get_owned_page(index)
+        del page[offset]
+        page.lineage.dirty.add(offset)
+        self._count -= 1
 
-    @profile
     def __len__(self):
-        count = 0
-        for p in self._pages:
-            count += len(self._pages[p])
-        return count
+        return self._count
 
     @profile
     def find(self, start, end, result_is_flat_list=False):
 
-        """
-        assert result_is_flat_list
-        values = []
-
-        addr = start
-        index, offset = self._get_index_offset(addr)
-        while addr <= end:
-
-            if index not in self._pages:
-                addr += self.PAGE_SIZE - offset
-                assert addr % self.PAGE_SIZE == 0
-                offset = 0
-                index += 1
-                continue
-
-            if offset in self._pages[index]:
-                v = self._pages[index][offset]
-                if type(v) in (list,):
-                    for vv in v:
-                        assert type(vv) not in (list,)
-                        values.append(vv)
-                else:
-                    values.append(v)
-
-            addr += 1
-            offset += 1
-            if offset >= self.PAGE_SIZE:
-                assert addr % self.PAGE_SIZE == 0
-                offset = 0
-                index += 1
-
-
-        """
         if result_is_flat_list:
             values = []
         else:
             values = {}
 
-        range_len = end - start
-        if range_len >= 1024:
-
-            #print "Large range... pages are " + str(len(self._pages))
-
-            indexes = sorted(self._pages.keys())
-            min_index = int(start / self.PAGE_SIZE)
-            max_index = int(end / self.PAGE_SIZE)
-            offset = start % self.PAGE_SIZE
-
-            #print "min_index=" + str(min_index) + " max_index=" + str(max_index)
-            #print indexes
-
-            pos = bisect.bisect_left(indexes, min_index)
-
-            while pos < len(indexes) and indexes[pos] <= max_index:
-
-                index = indexes[pos]
-                if index in self._pages:
-                    #print "Looking at page index=" + str(index) + " offset=" + str(offset)
-                    page = self._pages[index]
-                    while offset < self.PAGE_SIZE:
-                        if offset in page:
+        min_index = int(start / self.PAGE_SIZE)
+        max_index = int(end / self.PAGE_SIZE)
 
+        if max_index - min_index < len(self._pages):
+            indexes = range(min_index, max_index + 1)
+        else:
+            # large range: only look at existing pages
+            indexes = set(k for k in self._pages.keys() if min_index <= k <= max_index)
+            if self.image is not None:
+                indexes.update(self.image.page_indexes(min_index, max_index))
+            indexes = sorted(indexes)
+
+        for index in indexes:
+
+            base = index * self.PAGE_SIZE
+            first = max(start, base) - base
+            last = min(end, base + self.PAGE_SIZE - 1) - base
+
+            page = self._pages.get(index)
+
+            if page is None:
+                # untouched page: bytes come from the image
+                if self.image is not None:
+                    for addr, data in self.image.read(base + first, last - first + 1):
+                        for k in range(len(data)):
+                            v = self._image_item(addr + k, data[k])
                             if result_is_flat_list:
-
-                                v = page[offset]
-                                if type(v) in (list,):
-                                    for vv in v:
-                                        assert type(vv) not in (list,)
-                                        values.append(vv)
-                                else:
-                                    values.append(v)
-
+                                values.append(v)
                             else:
-                                values[index * self.PAGE_SIZE + offset] = page[offset]
-
-                        offset += 1
-                        if index * self.PAGE_SIZE + offset > end:
-                            return values
-                offset = 0
-                pos += 1
-
-        else:
-
-            addr = start
-            index, offset = self._get_index_offset(addr)
-            while addr <= end:
-
-                #print "reading from index=" + str(index) + " offset=" + str(offset)
-
-                if index not in self._pages:
-                    addr += self.PAGE_SIZE - offset
-                    offset = 0
-                    index += 1
-                    continue
-
-                if offset in self._pages[index]:
-
-                    if result_is_flat_list:
-
-                        v = self._pages[index][offset]
-                        if type(v) in (list,):
-                            for vv in v:
-                                assert type(vv) not in (list,)
-                                values.append(vv)
-                        else:
-                            values.append(v)
+                                values[addr + k] = v
+                continue
 
+            if last - first > 64:
+                offsets = sorted(o for o in page.keys() if first <= o <= last)
+            else:
+                offsets = (o for o in range(first, last + 1) if o in page)
+
+            for offset in offsets:
+                v = page[offset]
+                if result_is_flat_list:
+                    if type(v) in (list,):
+                        for vv in v:
+                            assert type(vv) not in (list,)
+                            values.append(vv)
                     else:
-                        values[addr] = self._pages[index][offset]
-
-                #else: print "address is empty"
-
-                addr += 1
-                offset += 1
-                if offset >= self.PAGE_SIZE:
-                    offset = 0
-                    index += 1
+                        values.append(v)
+                else:
+                    values[base + offset] = v
 
         return values
 
     def copy(self, memory):
-        return PagedMemory(pages=dict(self._pages), memory=memory)
+        # pages are now shared: both memories copy a page on its first write
+        self._last_index = None
+        self._last_page = None
+        return PagedMemory(pages=self._pages.copy(), memory=memory, image=self.image, count=self._count)
 
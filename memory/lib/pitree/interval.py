@@ -1,4 +1,6 @@
 class Interval(object):
+    __slots__ = ('begin', 'end', 'data')
+
     def __init__(self, begin, end, data=None):
         assert begin <= end
         self.begin  = begin
@@ -0,0 +1,210 @@
+from interval import *
+
+# ----------------------------------------------------------------------
+# PNode: immutable AVL node. Once created, a node is never modified:
+# insert and update build a new root-to-leaf path, sharing all the
+# other nodes with the previous version of the tree.
+# ----------------------------------------------------------------------
+class PNode(object):
+    __slots__ = ('interval', 'left_child', 'right_child', 'max', 'height')
+
+    def __init__(self, interval, left_child, right_child):
+        self.interval = interval
+        self.left_child = left_child
+        self.right_child = right_child
+        lh = left_child.height  if left_child  is not None else 0
+        rh = right_child.height if right_child is not None else 0
+        self.height = 1 + (lh if lh > rh else rh)
+        m = interval.end
+        if left_child is not None and left_child.max > m:
+            m = left_child.max
+        if right_child is not None and right_child.max > m:
+            m = right_child.max
+        self.max = m
+
+    @property
+    def balancing_factor(self):
+        return _height(self.right_child) - _height(self.left_child)
+
+
+class PRoot(object):
+    def __init__(self, child=None):
+        self.child = child
+        self.interval = "ROOT"
+
+
+def _height(node):
+    return node.height if node is not None else 0
+
+
+def _rotation_right(interval, left_child, right_child):
+    # left_child becomes the new subtree root
+    return PNode(left_child.interval, left_child.left_child,
+                 PNode(interval, left_child.right_child, right_child))
+
+
+def _rotation_left(interval, left_child, right_child):
+    # right_child becomes the new subtree root
+    return PNode(right_child.interval,
+                 PNode(interval, left_child, right_child.left_child),
+                 right_child.right_child)
+
+
+def _balance(interval, left_child, right_child):
+    bf = _height(right_child) - _height(left_child)
+    if bf <= -2:
+        if _height(left_child.right_child) > _height(left_child.left_child):
+            left_child = _rotation_left(left_child.interval, left_child.left_child, left_child.right_child)
+        return _rotation_right(interval, left_child, right_child)
+    elif bf >= 2:
+        if _height(right_child.left_child) > _height(right_child.right_child):
+            right_child = _rotation_right(right_child.interval, right_child.left_child, right_child.right_child)
+        return _rotation_left(interval, left_child, right_child)
+    return PNode(interval, left_child, right_child)
+
+
+def _insert(node, interval):
+    # recursive: the tree is balanced, hence only O(log n) frames deep
+    if node is None:
+        return PNode(interval, None, None)
+    if interval.begin >= node.interval.begin:
+        return _balance(node.interval, node.left_child, _insert(node.right_child, interval))
+    else:
+        return _balance(node.interval, _insert(node.left_child, interval), node.right_child)
+
+
+def _replace(node, old, new):
+    # intervals with the same begin can be on both sides after rotations:
+    # depth-first visit, left subtree first. path[:depth] holds the
+    # ancestors of the visited node.
+    if node is None:
+        return None
+    path = []
+    stack = [(node, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if node.max < old.end:
+            continue
+        del path[depth:]
+        if node.interval is old:
+            # same key: heights and max do not change, no rebalancing
+            child = node
+            node = PNode(new, node.left_child, node.right_child)
+            while path:
+                parent = path.pop()
+                if parent.right_child is child:
+                    node = PNode(parent.interval, parent.left_child, node)
+                else:
+                    node = PNode(parent.interval, node, parent.right_child)
+                child = parent
+            return node
+        path.append(node)
+        depth += 1
+        if old.begin >= node.interval.begin and node.right_child is not None:
+            stack.append((node.right_child, depth))
+        if old.begin <= node.interval.begin and node.left_child is not None:
+            stack.append((node.left_child, depth))
+    return None
+
+
+def _find(node, begin, end):
+    stack = [node] if node is not None else []
+    while stack:
+        node = stack.pop()
+        if node.max < end:
+            continue
+        i = node.interval
+        if i.begin == begin and i.end == end:
+            return i
+        if begin >= i.begin and node.right_child is not None:
+            stack.append(node.right_child)
+        if begin <= i.begin and node.left_child is not None:
+            stack.append(node.left_child)
+    return None
+
+
+def _search(node, interval, ris):
+    # iterative pre-order visit (node, left subtree, right subtree)
+    begin = interval.begin
+    end = interval.end
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        i = node.interval
+        if not (i.begin >= end or i.end <= begin):
+            ris.append(i)
+        if node.right_child is not None and i.begin <= end and node.right_child.max >= begin:
+            stack.append(node.right_child)
+        if node.left_child is not None and node.left_child.max >= begin:
+            stack.append(node.left_child)
+
+
+# ----------------------------------------------------------------------
+# PersistentIntervalTree
+# ----------------------------------------------------------------------
+class PersistentIntervalTree(object):
+    """
+    Interval tree with path copying: copy is O(1), add and update copy
+    only the O(log n) nodes on the path from the root to the changed node.
+    Intervals stored in the tree must not be modified in place: use update.
+    """
+
+    def __init__(self, root=None, n=0):
+        self.root = PRoot(root)
+        self.n = n
+
+    def copy(self):
+        """
+        Copy of the tree - O(1), nodes are shared
+        :rtype: PersistentIntervalTree
+        """
+        return PersistentIntervalTree(self.root.child, self.n)
+
+    def add(self, interval):
+        self.n += 1
+        self.root.child = _insert(self.root.child, interval)
+
+    def addi(self, begin, end, data=None):
+        i = Interval(begin, end, data)
+        self.add(i)
+        return i
+
+    def update(self, interval, data):
+        """
+        Replace interval (an object previously returned by search) with a
+        new interval having the same key and the given data.
+        :rtype: Interval
+        """
+        i = Interval(interval.begin, interval.end, data)
+        root = _replace(self.root.child, interval, i)
+        assert root is not None
+        self.root.child = root
+        return i
+
+    def find(self, begin, end):
+        """
+        Get one interval with key exactly equal to [begin, end), if any
+        """
+        return _find(self.root.child, begin, end)
+
+    def search(self, begin, end):
+        assert type(begin) in (int, long) and type(end) in (int, long) and begin <= end
+        if self.root.child is None:
+            return []
+        ris = []
+        _search(self.root.child, Interval(begin, end), ris)
+        return ris
+
+    def __iter__(self):
+        if self.root.child is not None:
+            stack = [self.root.child]
+            while stack != []:
+                el = stack.pop()
+                yield el.interval
+                if el.left_child is not None:
+                    stack.append(el.left_child)
+                if el.right_child is not None:
+                    stack.append(el.right_child)
+
+    def __len__(self):
+        return self.n
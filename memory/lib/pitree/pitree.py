@@ -20,7 +20,7 @@ limitations under the License.
 """
 
 import collections, sys
-from intervaltree import * # use custom interval tree
+from persistent_intervaltree import * # path-copying interval tree
 from interval import *
 from pympler import asizeof    
 
@@ -29,26 +29,24 @@ from pympler import asizeof
 # ----------------------------------------------------------------------
 class page:
 
-    def __init__(self, begin, end):
+    def __init__(self, begin, end, tree=None):
         """
         Page constructor
         """
         self.begin    = begin
         self.end      = end
         self.lazycopy = False
-        self.lookup   = dict()
-        self.tree     = IntervalTree()
+        self.owner    = None
+        self.tree     = PersistentIntervalTree() if tree is None else tree
 
     def copy(self):
         """
-        Lazy copy of the page - O(1)
+        Lazy copy of the page - O(1), tree nodes are shared until written
         :rtype: page
         """
         self.lazycopy = True
-        p = page(self.begin, self.end)
+        p = page(self.begin, self.end, self.tree.copy())
         p.lazycopy = True
-        p.tree     = self.tree
-        p.lookup   = self.lookup
         return p
 
     def add(self, begin, end, item=None):
@@ -57,11 +55,10 @@ class page:
         :param begin: interval begin point (key)
         :param end: interval end point (key)
         :param item: value associated with key
+        :rtype: Interval
         """
-        self._copy_on_write()
-        i = Interval(begin, end, item)
-        self.tree.add(i)
-        self.lookup[i] = i
+        self.lazycopy = False
+        return self.tree.addi(begin, end, item)
 
     def update_item(self, i, new_item):
         """
@@ -69,19 +66,9 @@ class page:
         :param i: object of type Interval previously returned by search
         :param new_item: new value for interval
         """
-        self._copy_on_write()
-        i = self.lookup[i]
-        i.data = new_item
-        return i
+        self.lazycopy = False
+        return self.tree.update(i, new_item)
 
-    def _copy_on_write(self):
-        if (self.lazycopy):
-            self.lazycopy = False
-            self.tree = self.tree.copy() # this clones Interval objects in the tree
-            self.lookup.clear()
-            for i in self.tree: 
-                self.lookup[i] = i
-        
     def __repr__(self):
         return "[begin="     + str(self.begin)      + \
                ", end="      + str(self.end)        + \
@@ -91,6 +78,43 @@ class page:
     __str__ = __repr__
 
 
+# ----------------------------------------------------------------------
+# point_page: single-byte intervals [a, a+1) of a page, by address
+# ----------------------------------------------------------------------
+class point_page:
+
+    def __init__(self, index, points=None):
+        """
+        Point page constructor
+        """
+        self.index  = index
+        self.owner  = None
+        self.points = dict() if points is None else points # address -> tuple of Interval
+
+    def copy(self):
+        """
+        Copy of the page - O(page size), intervals are shared
+        :rtype: point_page
+        """
+        return point_page(self.index, dict(self.points))
+
+    def add(self, i):
+        self.points[i.begin] = self.points.get(i.begin, ()) + (i,)
+
+    def update_item(self, i, new_item):
+        new_i = Interval(i.begin, i.end, new_item)
+        self.points[i.begin] = tuple(new_i if j is i else j for j in self.points[i.begin])
+        return new_i
+
+    def __len__(self):
+        return sum(len(l) for l in self.points.itervalues())
+
+    def __repr__(self):
+        return "[index=" + str(self.index) + ", points=" + str(self.points) + "]"
+
+    __str__ = __repr__
+
+
 # ----------------------------------------------------------------------
 # pitree
 # ----------------------------------------------------------------------
@@ -98,19 +122,46 @@ class pitree:
 
     stats = collections.namedtuple('stats', 'num_pages num_intervals num_1_intervals is_lazy_tree num_lazy_pages max_page_size, size, sum_range, max_range')
 
-    def __init__(self, page_size = 128):
-        self._pages       = IntervalTree()
-        self._lookup      = dict()
+    # paging schemes:
+    #   span: one page for each distinct span of pages [begin/page_size, end/page_size + 1)
+    #   pow2: an interval of length <= page_size * 2^k goes in the page covering
+    #         the two consecutive blocks of size page_size * 2^k that contain it:
+    #         O(address space / page_size * log range) pages
+    PAGING_SCHEMES = ('span', 'pow2')
+
+    # adaptive page size: when copied, the tree is repartitioned with a new
+    # page size if, over the last MIN_SEARCHES searches (or more), too many
+    # searches visited more than one page (and the page size would grow) or
+    # almost none did (and the page size would shrink). The new page size is
+    # PAGE_WIDTH_RATIO times the 90th percentile of the observed widths.
+    MIN_SEARCHES          = 256
+    MAX_MULTI_PAGE_RATIO  = 0.25
+    MIN_MULTI_PAGE_RATIO  = 0.01
+    PAGE_WIDTH_RATIO      = 8
+    MIN_PAGE_SIZE         = 16
+    MAX_PAGE_SIZE         = 1 << 16
+
+    def __init__(self, page_size = 128, paging = 'span', adaptive = False):
+        if paging not in pitree.PAGING_SCHEMES:
+            raise ValueError("unknown paging scheme " + str(paging))
+        self._pages       = PersistentIntervalTree()
+        self._points      = dict() # page index -> point_page, for single-byte intervals
+        self._owner       = object() # pages with a different owner are shared
         self._lazycopy    = False
         self._page_size   = page_size
+        self._paging      = paging
         self._num_inter   = 0
         self._num_1_inter = 0
+        self._adaptive    = adaptive
+        self._widths      = [0] * 65 if adaptive else None # widths of intervals and searches, by bit length
+        self._num_search  = 0 # searches since the last repartition
+        self._num_multi_page_search = 0
 
     def __repr__(self):
         return "---\npages="   + str(self._pages)       + "\n\n"  + \
-               "lookup="       + str(self._lookup)      + "\n\n"  + \
                "lazycopy="     + str(self._lazycopy)    + "\n"    + \
                "page_size="    + str(self._page_size)   + "\n"    + \
+               "paging="       + str(self._paging)      + "\n"    + \
                "num inter="    + str(self._num_inter)   + "\n---" + \
                "num 1-inter="  + str(self._num_1_inter) + "\n---"
 
@@ -120,10 +171,10 @@ class pitree:
         n_lazy_pages  = sum(1 for p in self._pages if p.data.lazycopy)
         m_page_size   = max(len(p.data.tree) for p in self._pages) if len(self._pages) > 0 else 0
         obj_size      = asizeof.asizeof(self)
-        all_intervals = self.search(0, sys.maxint)
+        all_intervals = self._all_intervals()
         s_range       = sum(i.end-i.begin for i in all_intervals)
         m_range       = max(i.end-i.begin for i in all_intervals) if s_range > 0 else 0
-        return pitree.stats(num_pages       = len(self._lookup),          \
+        return pitree.stats(num_pages       = len(self._pages),           \
                             num_intervals   = self._num_inter,            \
                             num_1_intervals = self._num_1_inter,          \
                             is_lazy_tree    = 1 if self._lazycopy else 0, \
@@ -187,36 +238,51 @@ class pitree:
         Lazy copy of the tree - O(1)
         :rtype: pitree
         """
+        if self._adaptive:
+            self._adapt_page_size()
         self._lazycopy = True
-        cloned = pitree(self._page_size)
+        self._owner    = object() # pages are now shared with the clone
+        cloned = pitree(self._page_size, self._paging)
         cloned._lazycopy    = True
         cloned._pages       = self._pages
-        cloned._lookup      = self._lookup
+        cloned._points      = self._points
         cloned._num_inter   = self._num_inter
         cloned._num_1_inter = self._num_1_inter
+        if self._adaptive:
+            cloned._adaptive   = True
+            cloned._widths     = list(self._widths)
+            cloned._num_search = self._num_search
+            cloned._num_multi_page_search = self._num_multi_page_search
         return cloned
 
+    def __len__(self):
+        return self._num_inter
+
+    def num_pages(self):
+        return len(self._pages) + len(self._points)
+
     def add(self, begin, end, item=None):
         """
         Insert new interval with key [begin, end) and value item.
         :param begin: interval begin point (key)
         :param end: interval end point (key)
         :param item: value associated with key
+        :rtype: Interval
         """
         assert begin < end
-        begin_p = begin / self._page_size
-        end_p   = end   / self._page_size + 1
-        self._copy_on_write()
-        try:
-            p = self._lookup[(begin_p, end_p)]
-        except KeyError:
-            p = page(begin_p, end_p)
-            self._lookup[(begin_p, end_p)] = p
-            self._pages.addi(p.begin, p.end, p)
-        p.add(begin, end, item)
+        if begin + 1 == end:
+            i = Interval(begin, end, item)
+            self._get_point_page(begin / self._page_size).add(i)
+        else:
+            begin_p, end_p = self._page_key(begin, end)
+            p = self._get_page(begin_p, end_p)
+            i = p.add(begin, end, item)
         self._num_inter = self._num_inter + 1
         if (begin + 1 == end):
             self._num_1_inter = self._num_1_inter + 1
+        if self._adaptive:
+            self._widths[min((end - begin).bit_length(), 64)] += 1
+        return i
 
     def search(self, begin, end):
         """
@@ -229,8 +295,16 @@ class pitree:
         begin_p = begin / self._page_size
         end_p   = end   / self._page_size + 1
         res = set()
-        for i in self._pages.search(begin_p, end_p):
+        pages = self._pages.search(begin_p, end_p)
+        for i in pages:
             res.update(i.data.tree.search(begin, end))
+        if len(self._points) > 0:
+            self._search_points(begin, end, res)
+        if self._adaptive:
+            self._widths[min((end - begin).bit_length(), 64)] += 1
+            self._num_search += 1
+            if len(pages) > 1:
+                self._num_multi_page_search += 1
         return res
 
     def update_item(self, i, new_item):
@@ -238,24 +312,151 @@ class pitree:
         Update item field of interval in the tree
         :param i: object of type Interval previously returned by search
         :param new_item: new value for interval
+        :rtype: Interval (replacing i)
         """
-        self._copy_on_write()
-        begin_p = i.begin / self._page_size
-        end_p   = i.end   / self._page_size + 1
-        p = self._lookup[(begin_p, end_p)]
+        if i.begin + 1 == i.end:
+            return self._get_point_page(i.begin / self._page_size).update_item(i, new_item)
+        begin_p, end_p = self._page_key(i.begin, i.end)
+        p = self._get_page(begin_p, end_p)
         return p.update_item(i, new_item)
 
+    def _search_points(self, begin, end, res):
+        """
+        Add to res the single-byte intervals [a, a+1) with begin <= a < end
+        """
+        first = begin / self._page_size
+        last  = (end - 1) / self._page_size
+        if last - first < len(self._points):
+            pages = [self._points.get(index) for index in xrange(first, last + 1)]
+        else:
+            pages = [p for index, p in self._points.iteritems() if first <= index <= last]
+
+        for p in pages:
+            if p is None:
+                continue
+            if end - begin <= len(p.points):
+                page_begin = p.index * self._page_size
+                for a in xrange(max(begin, page_begin), min(end, page_begin + self._page_size)):
+                    l = p.points.get(a)
+                    if l is not None:
+                        res.update(l)
+            else:
+                for a, l in p.points.iteritems():
+                    if begin <= a < end:
+                        res.update(l)
+
+    def _all_intervals(self):
+        intervals = [i for p in self._pages for i in p.data.tree]
+        for p in self._points.itervalues():
+            for l in p.points.itervalues():
+                intervals.extend(l)
+        return intervals
+
+    def _page_key(self, begin, end):
+        """
+        Key (in units of page_size) of the page holding the interval [begin, end)
+        :rtype: (int, int)
+        """
+        if self._paging == 'span':
+            return begin / self._page_size, end / self._page_size + 1
+
+        # pow2: smallest level k with end - begin <= page_size * 2^k
+        n = (end - begin + self._page_size - 1) / self._page_size
+        k = (n - 1).bit_length()
+        b = begin / (self._page_size << k)
+        return b << k, (b + 2) << k
+
+    def _choose_page_size(self):
+        """
+        Page size from the 90th percentile of the observed widths
+        :rtype: int
+        """
+        total = sum(self._widths)
+        if total == 0:
+            return self._page_size
+        k = 0
+        count = self._widths[0]
+        while count * 10 < total * 9:
+            k += 1
+            count += self._widths[k]
+        size = (1 << k) * pitree.PAGE_WIDTH_RATIO
+        return max(pitree.MIN_PAGE_SIZE, min(pitree.MAX_PAGE_SIZE, size))
+
+    def _adapt_page_size(self):
+        """
+        Repartition the tree if the cost of searches with the current page size is too high
+        """
+        if self._num_search < pitree.MIN_SEARCHES:
+            return
+
+        ratio = float(self._num_multi_page_search) / self._num_search
+        size = self._choose_page_size()
+        self._num_search = 0
+        self._num_multi_page_search = 0
+
+        if (ratio > pitree.MAX_MULTI_PAGE_RATIO and size > self._page_size) or \
+                (ratio < pitree.MIN_MULTI_PAGE_RATIO and size * 4 <= self._page_size):
+            self._repartition(size)
+
+    def _repartition(self, page_size):
+        """
+        Move all the intervals in new pages of the given size - O(n log n)
+        Intervals are moved, not copied: the objects previously returned by search are still valid.
+        """
+        intervals = self._all_intervals()
+        self._pages     = PersistentIntervalTree()
+        self._points    = dict()
+        self._owner     = object()
+        self._lazycopy  = False
+        self._page_size = page_size
+        for i in intervals:
+            if i.begin + 1 == i.end:
+                self._get_point_page(i.begin / page_size).add(i)
+                continue
+            begin_p, end_p = self._page_key(i.begin, i.end)
+            p = self._get_page(begin_p, end_p)
+            p.lazycopy = False
+            p.tree.add(i)
+
+    def _get_page(self, begin_p, end_p):
+        """
+        Get a page owned by this tree, creating or copying it if needed - O(log n)
+        """
+        self._copy_on_write()
+        i = self._pages.find(begin_p, end_p)
+        if i is None:
+            p = page(begin_p, end_p)
+            p.owner = self._owner
+            self._pages.addi(p.begin, p.end, p)
+        elif i.data.owner is not self._owner:
+            p = i.data.copy()
+            p.owner = self._owner
+            self._pages.update(i, p)
+        else:
+            p = i.data
+        return p
+
+    def _get_point_page(self, index):
+        """
+        Get a point page owned by this tree, creating or copying it if needed
+        """
+        self._copy_on_write()
+        p = self._points.get(index)
+        if p is None:
+            p = point_page(index)
+            p.owner = self._owner
+            self._points[index] = p
+        elif p.owner is not self._owner:
+            p = p.copy()
+            p.owner = self._owner
+            self._points[index] = p
+        return p
+
     def _copy_on_write(self):
         """
-        Clone pages and lookup data structures
+        Clone the root of the pages tree and the point index: pages are then copied one at a time
         """
         if (self._lazycopy):
             self._lazycopy = False
-            pages  = IntervalTree()
-            lookup = dict()
-            for p in self._lookup.values():
-                n = p.copy()
-                lookup[(p.begin, p.end)] = n
-                pages.addi(n.begin, n.end, n)
-            self._pages  = pages
-            self._lookup = lookup
+            self._pages = self._pages.copy()
+            self._points = dict(self._points)
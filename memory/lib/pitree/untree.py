@@ -51,6 +51,7 @@ class Untree(object):
 
         new_e = UntreeItem(e.begin, e.end, data, e.index)
         self._list[e.index] = new_e
+        return new_e
 
     def copy(self):
 
@@ -67,6 +68,7 @@ class Untree(object):
 
         e = UntreeItem(begin, end, data, len(self._list))
         self._list.append(e)
+        return e
 
     def _intersect(self, a_min, a_max, b_min, b_max):
         return min(a_max, b_max) - max(a_min, b_min) > 0
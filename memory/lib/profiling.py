@@ -0,0 +1,161 @@
+"""
+profiling: opt-in profiling of marked functions
+
+@profile only marks a function and returns it unchanged: when profiling
+is not enabled, calls cost nothing more. enable(*modules) replaces the
+marked functions and methods of the given modules with timing wrappers
+(disable() puts the originals back).
+
+For each function the report gives the number of calls, the inclusive
+time (time spent in the function and its callees) and the exclusive time
+(inclusive time minus the time spent in profiled callees), and for each
+caller the calls and inclusive time of each of its profiled callees.
+For recursive functions the inclusive time counts nested calls again.
+"""
+
+import sys
+import time
+
+_clock = time.time
+
+_enabled = False
+_patched = []  # (owner, attribute name, original function)
+
+_stats = {}  # label -> [ncalls, inclusive time, exclusive time]
+_edges = {}  # (caller label, callee label) -> [ncalls, inclusive time]
+_stack = []  # active calls: [label, time spent in profiled callees]
+
+
+def profile(func):
+    """
+    Mark func to be profiled when profiling is enabled
+    """
+    func.profiled = True
+    return func
+
+
+def _is_marked(obj):
+    return callable(obj) and getattr(obj, 'profiled', False) is True
+
+
+def _wrap(func, label):
+
+    def wrap(*args, **kwargs):
+        frame = [label, 0.0]
+        _stack.append(frame)
+        started_at = _clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = _clock() - started_at
+            _stack.pop()
+            _record(label, elapsed, elapsed - frame[1])
+
+    wrap.__name__ = func.__name__
+    wrap.__doc__ = func.__doc__
+    return wrap
+
+
+def _record(label, elapsed, exclusive):
+
+    s = _stats.get(label)
+    if s is None:
+        _stats[label] = [1, elapsed, exclusive]
+    else:
+        s[0] += 1
+        s[1] += elapsed
+        s[2] += exclusive
+
+    if len(_stack) > 0:
+        caller = _stack[-1]
+        caller[1] += elapsed
+        key = (caller[0], label)
+        e = _edges.get(key)
+        if e is None:
+            _edges[key] = [1, elapsed]
+        else:
+            e[0] += 1
+            e[1] += elapsed
+
+
+def _patch(owner, name, func, label):
+    _patched.append((owner, name, func))
+    setattr(owner, name, _wrap(func, label))
+
+
+def enable(*modules):
+    """
+    Profile the marked functions of the given modules, and the marked methods of their classes
+    """
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+
+    for module in modules:
+        prefix = module.__name__.split('.')[-1]
+        for name, obj in vars(module).items():
+            if _is_marked(obj) and getattr(obj, '__module__', None) == module.__name__:
+                _patch(module, name, obj, prefix + "." + name)
+            elif isinstance(obj, type) and obj.__module__ == module.__name__:
+                for attr, f in vars(obj).items():
+                    if _is_marked(f):
+                        _patch(obj, attr, f, obj.__name__ + "." + attr)
+
+
+def disable():
+    """
+    Restore the original functions
+    """
+    global _enabled
+    while len(_patched) > 0:
+        owner, name, func = _patched.pop()
+        setattr(owner, name, func)
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    _stats.clear()
+    _edges.clear()
+
+
+def stats():
+    """
+    :rtype: dict of label -> (ncalls, inclusive time, exclusive time)
+    """
+    return dict((label, tuple(s)) for label, s in _stats.items())
+
+
+def callees(label):
+    """
+    :rtype: dict of callee label -> (ncalls, inclusive time)
+    """
+    return dict((callee, tuple(e)) for (caller, callee), e in _edges.items() if caller == label)
+
+
+def report(out=None):
+    """
+    Print the profile, functions sorted by exclusive time
+    """
+    if out is None:
+        out = sys.stdout
+
+    out.write("\nProfiling stats:\n\n")
+    out.write("\t%-45s %10s %12s %12s\n" % ("function", "ncall", "incl (s)", "excl (s)"))
+    for label, s in sorted(_stats.items(), key=lambda x: -x[1][2]):
+        out.write("\t%-45s %10d %12.4f %12.4f\n" % (label, s[0], s[1], s[2]))
+
+    out.write("\nCalls (caller -> callee):\n\n")
+    for label, s in sorted(_stats.items(), key=lambda x: -x[1][1]):
+        children = sorted(callees(label).items(), key=lambda x: -x[1][1])
+        if len(children) == 0:
+            continue
+        out.write("\t%s (%.4f s)\n" % (label, s[1]))
+        for callee, e in children:
+            out.write("\t\t-> %-40s %10d %12.4f %6.1f%%\n" %
+                      (callee, e[0], e[1], 100.0 * e[1] / s[1] if s[1] > 0 else 0))
+    out.write("\n")
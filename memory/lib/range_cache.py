@@ -0,0 +1,105 @@
+"""
+range_cache: solver ranges of symbolic addresses
+
+Maps a symbolic address to the [min, max] range computed by the solver
+under a given set of constraints, identified by a fingerprint (the set of
+hashes of the constraints). A single cache is shared by a state and all
+the states derived from it: an entry is only used by a state whose
+constraints are the ones it was computed under, so sharing is safe.
+
+When the fingerprint of the current state is a superset of the one of an
+entry (constraints have only been added), the entry is refined: the new
+range is within the cached one, hence if the cached bounds are still
+feasible they are still the bounds, which a satisfiability check can tell
+more cheaply than a min/max query. Bounds known to hold for the address
+(e.g., from an interval analysis of the constraints) are refined the
+same way, also when no entry exists yet.
+
+The solver can add constraints while it computes a range (claripy adds
+the bounds it finds, e.g. addr <= max): an entry is recorded under the
+constraints after its computation, which are the ones the next query
+from the same state sees.
+"""
+
+
+class AddressRangeCache(object):
+
+    # entries kept for the same address (most recent last)
+    MAX_ENTRIES_PER_ADDR = 4
+
+    def __init__(self, max_addrs=8192):
+        self._max_addrs = max_addrs
+        self._entries = {}  # hash(addr) -> list of (fingerprint, min_addr, max_addr)
+        self.hits = 0
+        self.refinements = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(constraints):
+        return frozenset(hash(c) for c in constraints)
+
+    def resolve(self, se, addr, bounds=None):
+        """
+        Get the range of the symbolic address addr under the current constraints
+        :param bounds: (min, max) that contains every solution of addr, if known
+        :rtype: (int, int)
+        """
+        key = hash(addr)
+        fingerprint = self.fingerprint(se.constraints)
+
+        entries = self._entries.get(key)
+        if entries is not None:
+
+            # look for an entry computed under the same constraints or a subset of them
+            base = None
+            for e in reversed(entries):
+                if e[0] == fingerprint:
+                    self.hits += 1
+                    return e[1], e[2]
+                if base is None and e[0] <= fingerprint:
+                    base = e
+
+            if base is not None:
+                base = (base[1], base[2]) if bounds is None else \
+                    (max(base[1], bounds[0]), min(base[2], bounds[1]))
+                return self._refine(se, addr, key, base)
+
+        if bounds is not None:
+            return self._refine(se, addr, key, bounds)
+
+        self.misses += 1
+        min_addr = se.min_int(addr)
+        max_addr = se.max_int(addr)
+        self._add(key, self.fingerprint(se.constraints), min_addr, max_addr)
+        return min_addr, max_addr
+
+    def _refine(self, se, addr, key, bounds):
+        # the range is within bounds: feasible bounds are the range
+        self.refinements += 1
+        min_addr = bounds[0] if se.satisfiable(extra_constraints=(addr == bounds[0],)) else se.min_int(addr)
+        max_addr = bounds[1] if se.satisfiable(extra_constraints=(addr == bounds[1],)) else se.max_int(addr)
+        self._add(key, self.fingerprint(se.constraints), min_addr, max_addr)
+        return min_addr, max_addr
+
+    def _add(self, key, fingerprint, min_addr, max_addr):
+
+        entries = self._entries.get(key)
+        if entries is None:
+            if len(self._entries) >= self._max_addrs:
+                self._entries = {}
+            entries = []
+            self._entries[key] = entries
+        elif len(entries) >= self.MAX_ENTRIES_PER_ADDR:
+            del entries[0]
+
+        entries.append((fingerprint, min_addr, max_addr))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getstate__(self):
+        # entries are not pickled: the cache is rebuilt empty, still shared by the memories that shared it
+        return {'_max_addrs': self._max_addrs}
+
+    def __setstate__(self, d):
+        self.__init__(d['_max_addrs'])
@@ -0,0 +1,71 @@
+"""
+serialization: pickling of sets of states
+
+States derived from the same state share most of their memory: the
+pages of the concrete memory, the pages and nodes of the pitree, the
+entries of the write log and the items they hold are shared until one
+of the states writes them (copy on write). Pickling each state on its
+own would write a copy of every shared object for each state: a batch
+pickles a list of states with a single pickler, whose memo writes each
+shared object once. Ownership of pages is checked by identity (owner
+tokens, lineages), and identity within a batch is preserved: unpickled
+states still share what they shared, and still copy it on write.
+
+Objects that are not worth pickling or cannot be pickled (the project,
+the binary image, the memory backers) can be pickled by reference: they
+are given to the serializer as a table of shared objects, and a batch
+only stores their index in the table. The same table (with the same
+objects, in the same order) must be used to load the batch, hence this
+only works within a process or between processes forked after the
+table was built.
+
+Caches are not pickled: they are rebuilt empty when a batch is loaded.
+"""
+
+import cPickle
+import cStringIO
+
+# protocol 2 is required by classes with __slots__
+PROTOCOL = 2
+
+
+class BatchSerializer(object):
+
+    def __init__(self, shared=()):
+        self._shared = list(shared)
+        self._index = dict((id(o), k) for k, o in enumerate(self._shared))
+
+    def _persistent_id(self, obj):
+        return self._index.get(id(obj))
+
+    def dump(self, states, f):
+        """
+        Pickle a list of states in the file f
+        """
+        p = cPickle.Pickler(f, PROTOCOL)
+        if len(self._shared) > 0:
+            p.persistent_id = self._persistent_id
+        p.dump(list(states))
+
+    def load(self, f):
+        """
+        Load a list of states pickled by dump
+        :rtype: list of SimState
+        """
+        u = cPickle.Unpickler(f)
+        u.persistent_load = self._shared.__getitem__
+        return u.load()
+
+    def dumps(self, states):
+        """
+        :rtype: str
+        """
+        f = cStringIO.StringIO()
+        self.dump(states, f)
+        return f.getvalue()
+
+    def loads(self, data):
+        """
+        :rtype: list of SimState
+        """
+        return self.load(cStringIO.StringIO(data))
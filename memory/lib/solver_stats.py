@@ -0,0 +1,210 @@
+"""
+solver_stats: solver time by memory operation
+
+enable() wraps the query methods of the solver plugin (min/max,
+satisfiable, eval, simplify, ...) and the entry points of the memory
+plugin (load, store, merge, sigsegv refinement, ...). A solver call made
+while a memory operation is running is tagged with the innermost
+operation, its time and the size of the query: the number of path
+constraints and the depth of the expressions it is given. Solver calls
+made outside of the memory plugin are not recorded. Nothing is wrapped
+until enable() is called.
+
+For each operation, the report gives its exclusive time (minus nested
+operations) and the part of it spent in the solver, then the solver
+calls by operation and method. With a trace file, each solver call is
+also written as a JSON line.
+"""
+
+import json
+import sys
+import time
+
+_clock = time.time
+
+# solver methods that are timed (when defined by the solver class)
+SOLVER_METHODS = ('min_int', 'max_int', 'min', 'max', 'satisfiable', 'eval', 'eval_upto',
+                  'any_int', 'any_n_int', 'simplify')
+
+_enabled = False
+_patched = []  # (owner, attribute name, original function)
+_trace = None
+
+_ops = {}  # operation -> [ncalls, exclusive time, solver time]
+_calls = {}  # (operation, method) -> [ncalls, time, sum of constraints, sum of depths]
+_stack = []  # active memory operations: [operation, time spent in nested operations]
+_in_solver = False  # solver methods can call each other: only the outermost call is timed
+
+
+def _op_stats(op):
+    s = _ops.get(op)
+    if s is None:
+        s = [0, 0.0, 0.0]
+        _ops[op] = s
+    return s
+
+
+def _depth(args, kwargs):
+    depth = 0
+    for a in args:
+        d = getattr(a, 'depth', 0)
+        if d > depth:
+            depth = d
+    for c in kwargs.get('extra_constraints', ()):
+        d = getattr(c, 'depth', 0)
+        if d > depth:
+            depth = d
+    return depth
+
+
+def _wrap_operation(func, op):
+
+    def wrap(*args, **kwargs):
+        frame = [op, 0.0]
+        _stack.append(frame)
+        started_at = _clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = _clock() - started_at
+            _stack.pop()
+            s = _op_stats(op)
+            s[0] += 1
+            s[1] += elapsed - frame[1]
+            if len(_stack) > 0:
+                _stack[-1][1] += elapsed
+
+    wrap.__name__ = func.__name__
+    wrap.__doc__ = func.__doc__
+    return wrap
+
+
+def _wrap_solver(func, method):
+
+    def wrap(solver, *args, **kwargs):
+        global _in_solver
+        if _in_solver or len(_stack) == 0:
+            return func(solver, *args, **kwargs)
+        _in_solver = True
+        started_at = _clock()
+        try:
+            return func(solver, *args, **kwargs)
+        finally:
+            elapsed = _clock() - started_at
+            _in_solver = False
+            _record(_stack[-1][0], method, elapsed, len(solver.constraints), _depth(args, kwargs))
+
+    wrap.__name__ = func.__name__
+    wrap.__doc__ = func.__doc__
+    return wrap
+
+
+def _record(op, method, elapsed, constraints, depth):
+
+    _op_stats(op)[2] += elapsed
+
+    key = (op, method)
+    c = _calls.get(key)
+    if c is None:
+        _calls[key] = [1, elapsed, constraints, depth]
+    else:
+        c[0] += 1
+        c[1] += elapsed
+        c[2] += constraints
+        c[3] += depth
+
+    if _trace is not None:
+        _trace.write(json.dumps({'op': op, 'method': method, 'time': elapsed,
+                                 'constraints': constraints, 'depth': depth}) + "\n")
+
+
+def _patch(owner, name, wrap, tag):
+    func = owner.__dict__[name]
+    _patched.append((owner, name, func))
+    setattr(owner, name, wrap(func, tag))
+
+
+def enable(solver_class, memory_class, operations, trace=None):
+    """
+    Time the solver calls made by the memory plugin
+    :param solver_class: class of the solver plugin (state.se)
+    :param memory_class: class of the memory plugin
+    :param operations: dict of memory_class method name -> operation name
+    :param trace: file name of the JSONL trace of the solver calls, if any
+    """
+    global _enabled, _trace
+    if _enabled:
+        return
+    _enabled = True
+
+    if trace is not None:
+        _trace = open(trace, 'w')
+
+    for name in SOLVER_METHODS:
+        if name in solver_class.__dict__:
+            _patch(solver_class, name, _wrap_solver, name)
+
+    for name, op in operations.items():
+        _patch(memory_class, name, _wrap_operation, op)
+
+
+def disable():
+    """
+    Restore the original methods and close the trace
+    """
+    global _enabled, _trace
+    while len(_patched) > 0:
+        owner, name, func = _patched.pop()
+        setattr(owner, name, func)
+    if _trace is not None:
+        _trace.close()
+        _trace = None
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    _ops.clear()
+    _calls.clear()
+
+
+def operations():
+    """
+    :rtype: dict of operation -> (ncalls, exclusive time, solver time)
+    """
+    return dict((op, tuple(s)) for op, s in _ops.items())
+
+
+def calls():
+    """
+    :rtype: dict of (operation, method) -> (ncalls, time, sum of constraints, sum of depths)
+    """
+    return dict((key, tuple(c)) for key, c in _calls.items())
+
+
+def report(out=None):
+    """
+    Print the solver time by operation and by (operation, method)
+    """
+    if out is None:
+        out = sys.stdout
+
+    if _trace is not None:
+        _trace.flush()
+
+    out.write("\nSolver time by memory operation:\n\n")
+    out.write("\t%-20s %10s %12s %12s %8s\n" % ("operation", "ncall", "time (s)", "solver (s)", "solver"))
+    for op, s in sorted(_ops.items(), key=lambda x: -x[1][1]):
+        out.write("\t%-20s %10d %12.4f %12.4f %7.1f%%\n" %
+                  (op, s[0], s[1], s[2], 100.0 * s[2] / s[1] if s[1] > 0 else 0))
+
+    out.write("\nSolver calls:\n\n")
+    out.write("\t%-20s %-12s %10s %12s %12s %10s\n" %
+              ("operation", "method", "ncall", "time (s)", "constraints", "depth"))
+    for (op, method), c in sorted(_calls.items(), key=lambda x: -x[1][1]):
+        out.write("\t%-20s %-12s %10d %12.4f %12.1f %10.1f\n" %
+                  (op, method, c[0], c[1], float(c[2]) / c[0], float(c[3]) / c[0]))
+    out.write("\n")
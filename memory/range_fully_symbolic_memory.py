@@ -6,7 +6,6 @@ import sys
 import os
 import pyvex
 import traceback
-import bisect
 import cffi
 import resource
 import pdb
@@ -14,79 +13,52 @@ import time
 
 # our stuff
 from angr.state_plugins import SimActionObject, SimStateHistory
-from memory.lib import paged_memory, sorted_collection, unpaged_memory
+from memory.lib import paged_memory, unpaged_memory, binary_image, load_cache, range_cache, interval_bounds, guards, \
+    profiling, solver_stats
+from memory.lib.profiling import profile
 from memory.lib.pitree import pitree, untree
-from utils import get_obj_byte, reverse_addr_reg, get_unconstrained_bytes, convert_to_ast, full_stack, \
+from utils import get_obj_byte, get_obj_bytes, reverse_addr_reg, get_unconstrained_bytes, convert_to_ast, full_stack, \
     resolve_location_name
 
 log = logging.getLogger('memsight')
 log.setLevel(logging.DEBUG)
 
-# profiling vars
-time_profile = {}
-total_time = 0
-last_dump_time = 0
-count_ops = 0
+def enable_profiling():
+    """
+    Profile the functions marked with @profile in this module and in paged_memory
+    """
+    profiling.enable(sys.modules[__name__], paged_memory)
 
-profiling_enabled = False
 
-def update_counter(elapsed, f):
+# SymbolicMemory methods whose solver calls are attributed to an operation
+SOLVER_STATS_OPERATIONS = {
+    'load': 'load',
+    'store': 'store',
+    'merge': 'merge',
+    'merge_cost': 'merge',
+    'check_sigsegv_and_refine': 'sigsegv',
+    'find': 'find',
+    '__contains__': 'contains',
+}
 
-    global profiling_enabled
-    global time_profile
-    global count_ops
-    global total_time
-    global last_dump_time
 
-    if not profiling_enabled: return
-
-    if f not in time_profile:
-        time_profile[f] = [1, elapsed]
-    else:
-        time_profile[f][0] += 1
-        time_profile[f][1] += elapsed
-
-    total_time += elapsed
-    count_ops += 1
-
-    if total_time > 30:
-        #print "Executing " + str(f)
-        pass
-
-    if count_ops > 0 and (count_ops % 10000 == 0 or (total_time - last_dump_time>10)):
-        print_profiling_time_stats()
-        last_dump_time = total_time
-
-def print_profiling_time_stats(depth=None, pg=None):
-    print
-    print "Profiling stats" + ("at depth=" + str(depth) if depth is not None else "") + ":"
-    print
-    for ff in time_profile:
-        print "\t" + str(ff) + ": ncall=" + str(time_profile[ff][0]) + " ctime=" + str(time_profile[ff][1])
-    print
-    print
-
-
-def profile(func):
-    def wrap(*args, **kwargs):
-        import time
-        started_at = time.time()
-        result = func(*args, **kwargs)
-        elapsed = time.time() - started_at
-        update_counter(elapsed, func.__name__)
-        return result
-
-    return wrap
+def enable_solver_stats(trace=None):
+    """
+    Time the solver calls made by SymbolicMemory, by operation
+    :param trace: file name of the JSONL trace of the solver calls, if any
+    """
+    solver_stats.enable(angr.state_plugins.SimSolver, SymbolicMemory, SOLVER_STATS_OPERATIONS, trace)
 
 
 class MemoryItem(object):
-    __slots__ = ('addr', '_obj', 't', 'guard')
+    __slots__ = ('addr', '_obj', 't', 'guard', 'size')
 
-    def __init__(self, addr, obj, t, guard):
+    def __init__(self, addr, obj, t, guard, size=1):
         self.addr = addr
         self._obj = obj
         self.t = t
         self.guard = guard
+        self.size = size  # > 1: obj covers [addr, addr + size)
 
     @property
     def obj(self):
@@ -94,8 +66,18 @@ class MemoryItem(object):
             self._obj = get_obj_byte(self._obj[0], self._obj[1])
         return self._obj
 
+    def byte(self, offset):
+        """
+        Single-byte item for the byte at offset of a multi-byte item.
+        The byte is sliced lazily, i.e., only when its obj is needed.
+        :rtype: MemoryItem
+        """
+        assert 0 <= offset < self.size
+        return MemoryItem(self.addr + offset if offset > 0 else self.addr, [self._obj, offset], self.t, self.guard)
+
     def __repr__(self):
-        return "[" + str(self.addr) + ", " + str(self.obj) + ", " + str(self.t) + ", " + str(self.guard) + "]"
+        return "[" + str(self.addr) + ", " + str(self.obj) + ", " + str(self.t) + ", " + str(self.guard) + \
+               (", size=" + str(self.size) if self.size > 1 else "") + "]"
 
     # noinspection PyProtectedMember
     def _compare_obj(self, other):
@@ -134,8 +116,9 @@ class MemoryItem(object):
 
         if (other is None
             or self.t != other.t
+            or self.size != other.size
             # or (type(self.addr) in (int, long) and type(other.addr) in (int, long) and self.addr != other.addr)
-            or (type(self.obj) in (int, long) and type(other.obj) in (int, long) and self.obj != other.obj)
+            or (type(self._obj) in (int, long) and type(other._obj) in (int, long) and self._obj != other._obj)
             or id(self.guard) != id(other.guard)  # conservative
             or not self._compare_obj(other)):
             return False
@@ -143,7 +126,49 @@ class MemoryItem(object):
         return True
 
     def copy(self):
-        return MemoryItem(self.addr, self.obj, self.t, self.guard)
+        # a byte of a larger object is not sliced
+        return MemoryItem(self.addr, self._obj, self.t, self.guard, self.size)
+
+    def next_in_run(self, other):
+        """
+        True if other is the item for the next byte of the same source:
+        same guard and timestamp, and either the next byte of the same
+        object or another concrete byte.
+        """
+        if self.guard is not other.guard or self.t != other.t \
+                or type(self.addr) not in (int, long) or type(other.addr) not in (int, long) \
+                or other.addr != self.addr + 1:
+            return False
+
+        a = self._source_byte()
+        b = other._source_byte()
+        if a is not None or b is not None:
+            return a is not None and b is not None and a[0] is b[0] and b[1] == a[1] + 1
+
+        return self._concrete_value() is not None and other._concrete_value() is not None
+
+    def _source_byte(self):
+        """
+        (object, offset) of the byte of a larger object held by this item,
+        whether it has been sliced (by obj) or not. None for any other item.
+        """
+        obj = self._obj
+        if type(obj) in (list,):
+            return obj[0], obj[1]
+        if type(obj) not in (int, long) and obj.op == 'Extract' and obj.args[0] - obj.args[1] == 7:
+            src = obj.args[2]
+            left = len(src) - 1 - obj.args[0]
+            if left % 8 == 0:
+                return src, left / 8
+        return None
+
+    def _concrete_value(self):
+        obj = self._obj
+        if type(obj) in (int, long):
+            return obj & 0xFF
+        if obj.op == 'BVV' and len(obj) == 8:
+            return obj.args[0]
+        return None
 
 
 class MappedRegion(object):
@@ -186,12 +211,20 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
                  mapped_regions=[],
                  verbose=False,
                  timestamp=0,
-                 initializable=None,
+                 image=None,
                  initialized=False,
                  timestamp_implicit=0,
                  angr_memory=None,
                  debug_with_angr=False,
-                 profiling=False):
+                 profiling=False,
+                 multi_byte_symbolic_items=True,
+                 load_cache=False,
+                 address_range_cache=None,
+                 symbolic_log=None,
+                 symbolic_log_start=None,
+                 guard_table=None,
+                 solver_stats=False,
+                 solver_trace=None):
 
         angr.state_plugins.plugin.SimStatePlugin.__init__(self)
 
@@ -207,9 +240,28 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
         self._concrete_memory = paged_memory.PagedMemory(self) if concrete_memory is None else concrete_memory
         #self._concrete_memory = unpaged_memory.PagedMemory(self) if concrete_memory is None else concrete_memory
 
-        self._symbolic_memory = pitree.pitree() if symbolic_memory is None else symbolic_memory
+        self._symbolic_memory = pitree.pitree(adaptive=True) if symbolic_memory is None else symbolic_memory
         #self._symbolic_memory = untree.Untree() if symbolic_memory is None else symbolic_memory
 
+        # store a symbolic-address write as a single item covering all its bytes
+        self._multi_byte_symbolic_items = multi_byte_symbolic_items
+
+        # writes to the symbolic memory, newest first: a persistent list of
+        # (timestamp, implicit_timestamp, interval, replaced interval, next)
+        # shared by copies. It is cut at each merge: it starts at the
+        # timestamps in _symbolic_log_start (None: at the first write).
+        self._symbolic_log = symbolic_log
+        self._symbolic_log_start = symbolic_log_start
+
+        # merge guards, interned: shared with all the copies
+        self._guard_table = guards.GuardTable() if guard_table is None else guard_table
+
+        # memoization of loads, invalidated by overlapping stores
+        self._load_cache = load_cache.LoadCache() if load_cache else None
+
+        # solver ranges of symbolic addresses, shared with all the copies
+        self._address_range_cache = range_cache.AddressRangeCache() if address_range_cache is None else address_range_cache
+
         # some threshold
         self._maximum_symbolic_size = 8 * 1024
         self._maximum_concrete_size = 0x1000000
@@ -225,15 +277,19 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
         self.verbose = verbose
         if self.verbose: self.log("symbolic memory has been created")
 
-        self._initializable = initializable if initializable is not None else sorted_collection.SortedCollection(
-            key=lambda x: x[0])
+        # initial content of the memory, shared by all copies
+        self._image = image
+        self._concrete_memory.image = image
         self._initialized = initialized
 
         # required by CGC deallocate()
         self._page_size = self._concrete_memory.PAGE_SIZE
 
-        global profiling_enabled
-        profiling_enabled = profiling
+        if profiling:
+            enable_profiling()
+
+        if solver_stats:
+            enable_solver_stats(solver_trace)
 
         self.angr_memory = angr_memory
         if self.angr_memory is None and debug_with_angr:
@@ -289,40 +345,17 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
         if self._memory_backer is not None:
 
             _ffi = cffi.FFI()
+            segments = []
             for addr, backer in self._memory_backer.cbackers:
 
                 data = _ffi.buffer(backer)[:]
-                obj = claripy.BVV(data)
-
-                page_size = 0x1000
-                size = len(obj) / 8
-                data_offset = 0
-                page_index = int(addr / page_size)
-                page_offset = addr % page_size
-
                 if self.verbose:
-                    self.log("Pre-defined memory region: addr=" +  hex(addr) + " size=" + str(size))
-
-                while size > 0:
+                    self.log("Pre-defined memory region: addr=" +  hex(addr) + " size=" + str(len(data)))
 
-                    max_bytes_in_page = page_index * 0x1000 + 0x1000 - addr
-                    mo = [page_index, obj, data_offset, page_offset, min([size, page_size, max_bytes_in_page])]
-                    if self.verbose: self.log("Adding initializable area: page_index=" + str(mo[0]) + " size=" + str(
-                        mo[4]) + " data_offset=" + str(mo[2]))
-                    self._initializable.insert(mo)
-                    page_index += 1
-                    size -= page_size - page_offset
-                    data_offset += page_size - page_offset
-                    page_offset = 0
+                segments.append((addr, data))
 
-        """
-        # force load initialized bytes at the startup
-        indexes = set(self._initializable._keys)
-        for index in indexes:
-            self._load_init_data(index * 0x1000, 1)
-
-        assert len(self._initializable._keys) == 0
-        """
+            self._image = binary_image.BinaryImage(segments)
+            self._concrete_memory.image = self._image
 
         self._initialized = True
 
@@ -344,42 +377,6 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
                                                         angr.concretization_strategies.SimConcretizationStrategyRange(
                                                             1024 * 100))
 
-    @profile
-    def _load_init_data(self, addr, size):
-
-        page_size = 0x1000
-        page_index = int(addr / page_size)
-        page_end = int((addr + size) / page_size)
-        k = bisect.bisect_left(self._initializable._keys, page_index)
-
-        if self.verbose: self.log(
-            "\tChecking initializable: page index " + str(page_index) + " k=" + str(k) + " max_k=" + str(
-                len(self._initializable)) + " end_k=" + str(page_end))
-
-        to_remove = []
-        while k < len(self._initializable) and self._initializable[k][0] <= page_end:
-
-            data = self._initializable[k]  # [page_index, data, data_offset, page_offset, min(size, page_size]
-            if self.verbose: self.log("\tLoading initialized data at " + str(data[0])) # + " => " + str(data))
-            page = self._concrete_memory._pages[data[0]] if data[0] in self._concrete_memory._pages else None
-            for j in range(data[4]):
-
-                if page is not None and data[3] + j in page:
-                    continue
-
-                e = (data[0] * 0x1000) + data[3] + j
-                v = [data[1], data[2] + j]
-                self._concrete_memory[e] = MemoryItem(e, v, 0, None)
-
-            to_remove.append(data)
-            k += 1
-
-        for e in to_remove:
-            self._initializable.remove(e)
-
-        if len(to_remove):
-            if self.verbose: self.log("\tRemaining items in initializable: " + str(len(self._initializable)))
-
     @profile
     def _raw_ast(self, a):
         if type(a) is angr.state_plugins.sim_action_object.SimActionObject:
@@ -513,65 +510,92 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
 
             if type(size) in (int, long):
 
-                # concrete address
-                if type(addr) in (int, long):
-                    min_addr = addr
-                    max_addr = addr
+                data = None
+                cache_key = None
+                if self._load_cache is not None and angr_data is None:
+                    cache_key = self._load_cache.key(addr, size)
+                    entry = self._load_cache.get(cache_key)
+                    if entry is not None:
+                        if self.verbose: self.log("\tLoad cache hit: " + str(entry))
+                        data = entry.data
+                        if entry.min_addr == entry.max_addr:
+                            addr = entry.min_addr
 
-                # symbolic addr
-                else:
-                    min_addr = self.state.se.min_int(addr)
-                    max_addr = self.state.se.max_int(addr)
-                    if min_addr == max_addr:
-                        addr = min_addr
+                if data is None:
 
-                # check permissions
-                self.check_sigsegv_and_refine(addr, min_addr, max_addr, False)
+                    addr, min_addr, max_addr = self._resolve_addr_range(addr)
 
-                # check if binary data should be loaded into address space
-                self._load_init_data(min_addr, (max_addr - min_addr) + size)
+                    # check permissions
+                    self.check_sigsegv_and_refine(addr, min_addr, max_addr, False)
 
-                if angr_data is not None:
-                    assert size == len(angr_data) / 8
+                    if angr_data is not None:
+                        assert size == len(angr_data) / 8
 
-                data = None
-                for k in range(size):
+                    # query both indexes once for the whole range
+                    candidates = self._load_candidates(min_addr, max_addr, size)
+
+                    # bytes whose value is an ite: the initial (unconstrained) value of each of them
+                    objs = [None] * size
+                    ite = [False] * size
+
+                    for k in range(size):
 
-                    if self.verbose: self.log("\tLoading from: " + str(hex(addr + k) if type(addr) in (long, int) else (addr + k)))
-                    #if self.verbose: self.log("\tAddr = [" + str(hex(min_addr + k)) + ", " + str(hex(max_addr + k)) + "]")
+                        if self.verbose: self.log("\tLoading from: " + str(hex(addr + k) if type(addr) in (long, int) else (addr + k)))
+                        #if self.verbose: self.log("\tAddr = [" + str(hex(min_addr + k)) + ", " + str(hex(max_addr + k)) + "]")
 
-                    P = self._concrete_memory.find(min_addr + k, max_addr + k, True)
+                        P = candidates[k]
 
-                    P += [x.data for x in self._symbolic_memory.search(min_addr + k, max_addr + k + 1)]
-                    P = sorted(P, key=lambda x: (x.t, (x.addr if type(x.addr) in (int, long) else 0)))
+                        if self.verbose: self.log("\tMatching formulas:" + str(len(P)))
+                        #if self.verbose: self.log("\tMatching formulas:" + str(P))
 
-                    if self.verbose: self.log("\tMatching formulas:" + str(len(P)))
-                    #if self.verbose: self.log("\tMatching formulas:" + str(P))
+                        if min_addr == max_addr and len(P) == 1 and type(P[0].addr) in (long, int) and P[0].guard is None:
+                            objs[k] = P[0].obj
 
-                    if min_addr == max_addr and len(P) == 1 and type(P[0].addr) in (long, int) and P[0].guard is None:
-                        obj = P[0].obj
+                        else:
+
+                            name = "%s_%x" % (self.id, min_addr + k)
+                            obj = get_unconstrained_bytes(self.state, name, 8, memory=self)
+
+                            if (self.category == 'mem' and
+                                        angr.options.CGC_ZERO_FILL_UNCONSTRAINED_MEMORY not in self.state.options):
 
-                    else:
+                                if self.verbose: self.log("\t\tDoing an implicit store...")
 
-                        name = "%s_%x" % (self.id, min_addr + k)
-                        obj = get_unconstrained_bytes(self.state, name, 8, memory=self)
+                                # implicit store...
+                                self.implicit_timestamp -= 1
+                                self._invalidate_loads(min_addr + k, max_addr + k)
+                                self._symbolic_add(min_addr + k, max_addr + k + 1,
+                                                   MemoryItem(addr + k, obj, self.implicit_timestamp, None))
 
-                        if (self.category == 'mem' and
-                                    angr.options.CGC_ZERO_FILL_UNCONSTRAINED_MEMORY not in self.state.options):
+                            objs[k] = obj
+                            ite[k] = True
 
-                            if self.verbose: self.log("\t\tDoing an implicit store...")
+                    k = 0
+                    while k < size:
 
-                            # implicit store...
-                            self.implicit_timestamp -= 1
-                            self._symbolic_memory.add(min_addr + k, max_addr + k + 1,
-                                                      MemoryItem(addr + k, obj, self.implicit_timestamp, None))
+                        obj = objs[k]
+                        n = 1
 
-                        if self.verbose: self.log("\tAdding ite cases: " + str(len(P)))
-                        obj = self.build_merged_ite(addr + k, P, obj)
+                        if ite[k]:
+
+                            # consecutive bytes with items from the same sources: one ite for all of them
+                            if min_addr == max_addr:
+                                n = self._merged_run_length(candidates, ite, k)
+
+                            if n > 1:
+                                if self.verbose: self.log("\tAdding ite cases for " + str(n) + " bytes: " + str(len(candidates[k])))
+                                obj = self.build_merged_run_ite(candidates[k:k + n], self.state.se.Concat(*objs[k:k + n]))
+                            else:
+                                if self.verbose: self.log("\tAdding ite cases: " + str(len(candidates[k])))
+                                obj = self.build_merged_ite(addr + k, candidates[k], obj)
 
-                    # concat single-byte objs
-                    if self.verbose: self.log("\tappending data: ")# + str(obj))
-                    data = self.state.se.Concat(data, obj) if data is not None else obj
+                        # concat objs
+                        if self.verbose: self.log("\tappending data: ")# + str(obj))
+                        data = self.state.se.Concat(data, obj) if data is not None else obj
+                        k += n
+
+                    if cache_key is not None:
+                        self._load_cache.add(cache_key, min_addr, max_addr, size, data)
 
                 if condition is not None:
                     assert fallback is not None
@@ -642,6 +666,117 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
             traceback.print_exc()
             sys.exit(1)
 
+    @profile
+    def _resolve_addr_range(self, addr):
+        """
+        Get the range of values of addr: a symbolic addr with a single
+        solution is replaced by its value. min and max are solutions of addr.
+        The cheap bounds of the interval analysis skip the solver only when
+        they give a single value: otherwise the range cache checks them.
+        :rtype: (addr, int, int)
+        """
+        # concrete address
+        if type(addr) in (int, long):
+            return addr, addr, addr
+
+        known = interval_bounds.constraint_bounds(self.state.se.constraints)
+        min_addr, max_addr = interval_bounds.bounds(addr, known)
+
+        # symbolic addr: bounds are only worth checking if the analysis found some
+        if min_addr != max_addr:
+            bounds = (min_addr, max_addr) if (min_addr, max_addr) != interval_bounds.full_range(addr) else None
+            min_addr, max_addr = self._address_range_cache.resolve(self.state.se, addr, bounds)
+
+        if min_addr == max_addr:
+            addr = min_addr
+
+        return addr, min_addr, max_addr
+
+    @profile
+    def _load_candidates(self, min_addr, max_addr, size):
+        """
+        Get, for each byte of a load of size bytes whose address is within
+        [min_addr, max_addr], the list of items that may overlap with it.
+        Concrete and symbolic memories are queried once for the whole range
+        [min_addr, max_addr + size) and results are then split per byte.
+        :rtype: list of size lists of MemoryItem, each sorted by (t, addr)
+        """
+        items = []
+
+        C = self._concrete_memory.find(min_addr, max_addr + size - 1)
+        for a in sorted(C.keys()):
+            # byte k can read a iff min_addr + k <= a <= max_addr + k
+            first = max(0, a - max_addr)
+            last = min(size - 1, a - min_addr)
+            v = C[a]
+            if type(v) in (list,):
+                for vv in v:
+                    items.append((vv, first, last))
+            else:
+                items.append((v, first, last))
+
+        for i in self._symbolic_memory.search(min_addr, max_addr + size):
+
+            if i.data.size == 1:
+                # byte k can read i iff [i.begin, i.end) overlaps [min_addr + k, max_addr + k + 1)
+                first = max(0, i.begin - max_addr)
+                last = min(size - 1, i.end - 1 - min_addr)
+                items.append((i.data, first, last))
+
+            else:
+                # multi-byte item: its byte j is within [i.begin + j, item_max_addr + j]
+                # only bytes that some byte k of the load can read are extracted
+                item_max_addr = i.end - i.data.size
+                for j in range(max(0, min_addr - item_max_addr), min(i.data.size - 1, max_addr + size - 1 - i.begin) + 1):
+                    first = max(0, i.begin + j - max_addr)
+                    last = min(size - 1, item_max_addr + j - min_addr)
+                    items.append((i.data.byte(j), first, last))
+
+        # sort once: per-byte lists are then filled already sorted
+        items.sort(key=lambda x: (x[0].t, (x[0].addr if type(x[0].addr) in (int, long) else 0)))
+
+        P = [[] for _ in range(size)]
+        for item, first, last in items:
+            for k in range(first, last + 1):
+                P[k].append(item)
+
+        return P
+
+    def _merged_run_length(self, candidates, ite, k):
+        """
+        Number of consecutive bytes, starting from byte k of a load at a concrete
+        address, whose lists of items are made by the same sequence of sources.
+        """
+        n = 1
+        while k + n < len(candidates) and ite[k + n] and len(candidates[k + n]) == len(candidates[k]) \
+                and all(p.next_in_run(q) for p, q in zip(candidates[k + n - 1], candidates[k + n])):
+            n += 1
+        return n
+
+    @profile
+    def build_merged_run_ite(self, P_run, obj):
+        """
+        Ite for a run of bytes at a concrete address: P_run[j] is the list of items
+        of byte j, all lists have the same sources in the same order.
+        """
+        for i in range(len(P_run[0])):
+
+            items = [P[i] for P in P_run]
+            first = items[0]
+
+            source = first._source_byte()
+            if source is not None:
+                v = get_obj_bytes(source[0], source[1], len(items))[0]
+            else:
+                value = 0
+                for p in items:
+                    value = (value << 8) | p._concrete_value()
+                v = claripy.BVV(value, 8 * len(items))
+
+            obj = self.state.se.If(first.guard, v, obj) if first.guard is not None else v
+
+        return obj
+
     @profile
     def build_merged_ite(self, addr, P, obj):
 
@@ -781,28 +916,28 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
                     data = data.reversed
                     # if self.verbose: self.log("\treversed data: " + str(data))
 
-                # concrete address
-                if type(addr) in (int, long):
-                    min_addr = addr
-                    max_addr = addr
-
-                # symbolic addr
-                else:
-                    min_addr = self.state.se.min_int(addr)
-                    max_addr = self.state.se.max_int(addr)
-                    if min_addr == max_addr:
-                        addr = min_addr
+                addr, min_addr, max_addr = self._resolve_addr_range(addr)
 
                 # check permissions
                 self.check_sigsegv_and_refine(addr, min_addr, max_addr, True)
 
+                self._invalidate_loads(min_addr, max_addr + (size if type(size) in (int, long) else conditional_size[1]) - 1)
+
                 self.timestamp += 1
 
                 initial_condition = condition
 
                 compilation_flag = 0
 
-                for k in range(size if type(size) in (int, long) else conditional_size[1]):
+                # symbolic addr and same condition for all bytes: one item for the whole store
+                if self._multi_byte_symbolic_items and min_addr != max_addr \
+                        and conditional_size is None and size > 1:
+                    self._store_multi_byte_item(addr, data, size, min_addr, max_addr, condition)
+                    size_to_store = 0
+                else:
+                    size_to_store = size if type(size) in (int, long) else conditional_size[1]
+
+                for k in range(size_to_store):
 
                     compilation_flag += 1
 
@@ -852,15 +987,14 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
                             for p in P:
                                 if id(p.data.addr) == id(addr + k):  # this check is pretty useless...
                                     if self.verbose: self.log("\tUpdating node...")
-                                    self._symbolic_memory.update_item(p,
-                                                                      MemoryItem(addr + k, obj, self.timestamp, None))
+                                    self._symbolic_update(p, MemoryItem(addr + k, obj, self.timestamp, None))
                                     inserted = True
                                     break
 
                     if not inserted:
                         if self.verbose: self.log("\tAdding node...")
-                        self._symbolic_memory.add(min_addr + k, max_addr + k + 1,
-                                                  MemoryItem(addr + k, obj, self.timestamp, condition))
+                        self._symbolic_add(min_addr + k, max_addr + k + 1,
+                                           MemoryItem(addr + k, obj, self.timestamp, condition))
 
                 if self.verbose: self.log("returning")
 
@@ -928,6 +1062,84 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
             traceback.print_exc()
             sys.exit(1)
 
+    def _invalidate_loads(self, begin, end):
+        if self._load_cache is not None:
+            self._load_cache.invalidate(begin, end)
+
+    @profile
+    def _store_multi_byte_item(self, addr, data, size, min_addr, max_addr, condition):
+
+        item = MemoryItem(addr, data, self.timestamp, condition, size)
+
+        if condition is None:
+            P = self._symbolic_memory.search(min_addr, max_addr + size)
+            if self.verbose: self.log("\tConflicting formulas: " + str(len(P)))
+            for p in P:
+                if id(p.data.addr) == id(addr) and p.data.size == size:
+                    if self.verbose: self.log("\tUpdating multi-byte node...")
+                    self._symbolic_update(p, item)
+                    return
+
+        if self.verbose: self.log("\tAdding multi-byte node...")
+        self._symbolic_add(min_addr, max_addr + size, item)
+
+    def _symbolic_add(self, begin, end, item):
+        i = self._symbolic_memory.add(begin, end, item)
+        self._symbolic_log = (self.timestamp, self.implicit_timestamp, i, None, self._symbolic_log)
+
+    def _symbolic_update(self, p, item):
+        i = self._symbolic_memory.update_item(p, item)
+        self._symbolic_log = (self.timestamp, self.implicit_timestamp, i, p, self._symbolic_log)
+
+    @staticmethod
+    def _stored_since(item, ancestor_timestamp, ancestor_timestamp_implicit):
+        return (item.t > 0 and item.t >= ancestor_timestamp) or (
+                    item.t < 0 and item.t < ancestor_timestamp_implicit)
+
+    @profile
+    def _symbolic_writes_since(self, ancestor_timestamp, ancestor_timestamp_implicit):
+        """
+        Get the intervals of the symbolic memory with an item stored after
+        the given timestamps, and the intervals with an item stored before
+        them that have been replaced since, walking the write log back to
+        the timestamps. If the log has been cut after them (at a merge),
+        the tree is scanned instead, and replaced intervals are unknown.
+        :rtype: (list of Interval, list of Interval)
+        """
+        start = self._symbolic_log_start
+        if start is not None and (ancestor_timestamp < start[0] or ancestor_timestamp_implicit > start[1]):
+            return [p for p in self._symbolic_memory.search(0, sys.maxint)
+                    if self._stored_since(p.data, ancestor_timestamp, ancestor_timestamp_implicit)], []
+
+        res = []
+        overwritten = []
+        replaced = set()  # ids of the intervals replaced by a later update
+        log = self._symbolic_log
+        while log is not None:
+
+            timestamp, implicit_timestamp, p, old, log = log
+
+            # written before the fork: so is everything older
+            if timestamp < ancestor_timestamp and implicit_timestamp >= ancestor_timestamp_implicit:
+                break
+
+            if old is not None:
+                replaced.add(id(old))
+                if not self._stored_since(old.data, ancestor_timestamp, ancestor_timestamp_implicit):
+                    overwritten.append(old)
+
+            if id(p) not in replaced and self._stored_since(p.data, ancestor_timestamp, ancestor_timestamp_implicit):
+                res.append(p)
+
+        return res, overwritten
+
+    def _symbolic_items_since(self, ancestor_timestamp, ancestor_timestamp_implicit):
+        """
+        Get the intervals of the symbolic memory with an item stored after the given timestamps
+        :rtype: list of Interval
+        """
+        return self._symbolic_writes_since(ancestor_timestamp, ancestor_timestamp_implicit)[0]
+
     @profile
     def same(self, a, b, range_a=None, range_b=None):
 
@@ -1049,15 +1261,43 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
                            mapped_regions=self._mapped_regions[:],
                            verbose=self.verbose,
                            timestamp=self.timestamp,
-                           initializable=self._initializable.copy(),
+                           image=self._image,
                            initialized=self._initialized,
                            timestamp_implicit=self.implicit_timestamp,
-                           angr_memory=self.angr_memory.copy() if self.angr_memory is not None else None)
+                           angr_memory=self.angr_memory.copy() if self.angr_memory is not None else None,
+                           multi_byte_symbolic_items=self._multi_byte_symbolic_items,
+                           address_range_cache=self._address_range_cache,
+                           symbolic_log=self._symbolic_log,
+                           symbolic_log_start=self._symbolic_log_start,
+                           guard_table=self._guard_table)
 
         s._concrete_memory = self._concrete_memory.copy(s)
+        s._load_cache = self._load_cache.copy() if self._load_cache is not None else None
 
         return s
 
+    def __getstate__(self):
+        # caches and the guard table are rebuilt empty (see their __getstate__).
+        # The entries of the write log are listed oldest first: each entry is
+        # then pickled after the one it links to, hence a long log does not
+        # exceed the recursion limit, and the entries shared with other
+        # memories pickled by the same pickler are written once.
+        d = self.__dict__.copy()
+        d['state'] = None
+        log = []
+        entry = self._symbolic_log
+        while entry is not None:
+            log.append(entry)
+            entry = entry[4]
+        log.reverse()
+        d['_symbolic_log'] = log
+        return d
+
+    def __setstate__(self, d):
+        log = d['_symbolic_log']
+        d['_symbolic_log'] = log[-1] if len(log) > 0 else None
+        self.__dict__.update(d)
+
     @property
     def id(self):
 
@@ -1163,6 +1403,10 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
         # sort mapped regions 
         self._mapped_regions = sorted(self._mapped_regions, key=lambda x: x.addr)
 
+        # cached loads did not check these permissions
+        if self._load_cache is not None:
+            self._load_cache.clear()
+
     @profile
     def unmap_region(self, addr, length):
 
@@ -1172,6 +1416,8 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
         if isinstance(addr, claripy.ast.bv.BV):
             addr = self.state.se.max_int(addr)
 
+        self._invalidate_loads(addr, addr + length - 1)
+
         self.timestamp += 1
         for a in range(addr, addr + length):
             self._concrete_memory[a] = MemoryItem(a, 0x0, self.timestamp, None)
@@ -1287,45 +1533,131 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
 
             print full_stack()
 
+    def telemetry(self):
+        """
+        Sizes of the memory, cheap enough to be taken at every step
+        :rtype: dict
+        """
+        return {
+            'concrete_pages': len(self._concrete_memory._pages),
+            'concrete_items': len(self._concrete_memory),
+            'symbolic_items': len(self._symbolic_memory),
+            'symbolic_pages': self._symbolic_memory.num_pages(),
+        }
+
     @profile
     def merge(self, others, merge_conditions, common_ancestor=None):
 
         assert common_ancestor is not None
-        if type(common_ancestor) in (SimStateHistory,):
-            ancestor_timestamp = common_ancestor.timestamps[0]
-            ancestor_implicit_timestamp = common_ancestor.timestamps[1]
-        else:
-            ancestor_timestamp = common_ancestor.state.history.timestamps[0]
-            ancestor_implicit_timestamp = common_ancestor.state.history.timestamps[1]
+        ancestor_timestamp, ancestor_implicit_timestamp = self._ancestor_timestamps(common_ancestor)
 
         if self.angr_memory is not None:
             self._compare_with_angr(op='pre_merge')
-            others[0]._compare_with_angr(op='pre_merge_other')
+            for o in others:
+                o._compare_with_angr(op='pre_merge_other')
 
         if self.angr_memory is not None:
-            self.angr_memory.merge([others[0].angr_memory], merge_conditions, common_ancestor)
+            self.angr_memory.merge([o.angr_memory for o in others], merge_conditions, common_ancestor)
 
         # self.state.state_counter.log.append("[" + hex(self.state.regs.ip.args[0]) + "] " + "Merge")
 
         if self.verbose: self.log("Merging memories of " + str(len(others) + 1) + " states")
         assert len(merge_conditions) == 1 + len(others)
-        assert len(others) == 1  # ToDo: add support for merging of multiple memories
+        assert len(others) >= 1
 
-        count = self._merge_concrete_memory(others[0], merge_conditions)
-        count += self._merge_symbolic_memory(others[0], merge_conditions, ancestor_timestamp, ancestor_implicit_timestamp)
+        if self._load_cache is not None:
+            self._load_cache.clear()
 
-        self.timestamp = max(self.timestamp, others[0].timestamp) + 1
-        self.implicit_timestamp = min(self.implicit_timestamp, others[0].implicit_timestamp)
+        # all memories are merged at once: each item gets a single merge condition
+        count = self._merge_concrete_memory(others, merge_conditions)
+        count += self._merge_symbolic_memory(others, merge_conditions, ancestor_timestamp, ancestor_implicit_timestamp)
+
+        self.timestamp = max([self.timestamp] + [o.timestamp for o in others]) + 1
+        self.implicit_timestamp = min([self.implicit_timestamp] + [o.implicit_timestamp for o in others])
+
+        # the merged memory is the ancestor of the next merges: older writes
+        # are not needed, and would otherwise be kept by all the descendants
+        self._symbolic_log = None
+        self._symbolic_log_start = (self.timestamp, self.implicit_timestamp)
 
         return count
 
+    def _ancestor_timestamps(self, common_ancestor):
+        if type(common_ancestor) in (SimStateHistory,):
+            return common_ancestor.timestamps[0], common_ancestor.timestamps[1]
+        else:
+            return common_ancestor.state.history.timestamps[0], common_ancestor.state.history.timestamps[1]
+
+    @profile
+    def merge_cost(self, others, common_ancestor=None):
+        """
+        Estimate, without the solver, how much merging with others would slow
+        down later loads: the number of ite cases that the merge would add
+        (guarded copies of the bytes that differ in the concrete memory, and
+        of the addresses covered by symbolic items stored since the fork),
+        weighted by the average size of the guards of these items.
+
+        If the timestamps of the common ancestor are unknown, all the
+        symbolic items are counted.
+        :rtype: float
+        """
+        try:
+            ancestor_timestamp, ancestor_implicit_timestamp = self._ancestor_timestamps(common_ancestor)
+        except AttributeError:
+            ancestor_timestamp, ancestor_implicit_timestamp = 0, 0
+
+        memories = [self] + others
+
+        cases = 0
+        guard_depth = 0
+        guarded = 0
+
+        # concrete memory: each differing byte gets one item per memory
+        page_indexes = set()
+        for m in memories:
+            page_indexes |= set(m._concrete_memory._pages.keys())
+
+        for page_index in page_indexes:
+
+            pages = [m._concrete_memory._pages.get(page_index) for m in memories]
+            if all(id(page) == id(pages[0]) for page in pages):
+                continue
+
+            offsets = paged_memory.changed_offsets(pages)
+            if offsets is None:
+                cases += len(memories) * self._concrete_memory.PAGE_SIZE
+                continue
+
+            cases += len(memories) * len(offsets)
+            for page in pages:
+                if page is None:
+                    continue
+                for offset in offsets:
+                    v = page.get(offset)
+                    for item in (v if type(v) in (list,) else [v]):
+                        if item is not None and item.guard is not None:
+                            guard_depth += item.guard.depth
+                            guarded += 1
+
+        # symbolic memory: each item stored since the fork gets guarded, as
+        # each item of the ancestor replaced since the fork in this memory
+        for m in memories:
+            written, overwritten = m._symbolic_writes_since(ancestor_timestamp, ancestor_implicit_timestamp)
+            for p in (written + overwritten if m is self else written):
+                cases += p.end - p.begin
+                if p.data.guard is not None:
+                    guard_depth += p.data.guard.depth
+                    guarded += 1
+
+        return cases * (1.0 + (float(guard_depth) / guarded if guarded > 0 else 0.0))
+
     def post_merge(self):
         # print "POST MERGE"
         if self.angr_memory is not None:
             self._compare_with_angr(op='merge')
 
     @profile
-    def _merge_concrete_memory(self, other, merge_conditions, verbose=False):
+    def _merge_concrete_memory(self, others, merge_conditions, verbose=False):
 
         # start_time = time.time()
 
@@ -1333,107 +1665,71 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
 
             if self.verbose: self.log("Merging concrete addresses...")
 
-            assert self._stack_range == other._stack_range
-
-            # assert len(set(self._initializable._keys)) == 0
-            # assert len(set(other._initializable._keys)) == 0
+            memories = [self] + others
 
-            missing_self = set(self._initializable._keys) - set(other._initializable._keys)
-            for index in missing_self:
-                self._load_init_data(index * 0x1000, 1)
-
-            assert len(set(self._initializable._keys) - set(other._initializable._keys)) == 0
-
-            missing_other = set(other._initializable._keys) - set(self._initializable._keys)
-            for index in missing_other:
-                other._load_init_data(index * 0x1000, 1)
-
-            assert len(set(other._initializable._keys) - set(self._initializable._keys)) == 0
+            for o in others:
+                assert self._stack_range == o._stack_range
 
             count = 0
 
             # basic idea:
-            # get all in-use addresses among both memories
+            # get all in-use addresses among all memories
             # for each address:
             #   - if it is in use in all memories and it has the same byte content then do nothing
             #   - otherwise map the address to an ite with all the possible contents + a bottom case
 
-            page_indexes = set(self._concrete_memory._pages.keys())
-            page_indexes |= set(other._concrete_memory._pages.keys())
-
-            # assert len(page_indexes) == 0
+            page_indexes = set()
+            for m in memories:
+                page_indexes |= set(m._concrete_memory._pages.keys())
 
             for page_index in page_indexes:
 
-                # print "merging next page..."
-
-                page_self = self._concrete_memory._pages[
-                    page_index] if page_index in self._concrete_memory._pages else None
-                page_other = other._concrete_memory._pages[
-                    page_index] if page_index in other._concrete_memory._pages else None
+                pages = [m._concrete_memory._pages.get(page_index) for m in memories]
 
                 # shared page? if yes, do no touch it
-                if id(page_self) == id(page_other):
+                if all(id(page) == id(pages[0]) for page in pages):
                     continue
 
-                offsets = set(page_self.keys()) if page_self is not None else set()
-                offsets |= set(page_other.keys()) if page_other is not None else set()
+                # only offsets written since the pages diverged can differ
+                offsets = paged_memory.changed_offsets(pages)
+                if offsets is None:
+                    offsets = set()
+                    for page in pages:
+                        if page is not None:
+                            offsets |= set(page.keys())
 
                 for offset in offsets:
 
-                    v_self = page_self[offset] if page_self is not None and offset in page_self else None
-                    v_other = page_other[offset] if page_other is not None and offset in page_other else None
-
-                    if type(v_self) not in (list,) and type(v_other) not in (list,):
+                    addr = page_index * 0x1000 + offset
 
-                        if v_self is not None and v_other is not None:
-                            assert v_self.addr == v_other.addr
-                            pass
-
-                        same_value = v_self == v_other
-                    else:
-                        if type(v_self) != type(v_other):
-                            same_value = False
-                        elif len(v_self) != len(v_other):
-                            same_value = False
+                    # a page missing in a memory still has its initial content in the image
+                    values = []
+                    for m, page in zip(memories, pages):
+                        if page is not None:
+                            values.append(page[offset] if offset in page else None)
                         else:
-                            same_value = True
-                            for k in range(len(v_self)):  # we only get equality when items are in the same order
-
-                                sub_v_self = v_self[k]
-                                sub_v_other = v_other[k]
-
-                                assert type(sub_v_self) not in (list,)
-                                assert type(sub_v_other) not in (list,)
-                                assert sub_v_self.addr == sub_v_other.addr
-
-                                if sub_v_self != sub_v_other:
-                                    same_value = False
-                                    break
-
-                    # self has an initialized value that is missing in other
-                    # we can keep as it is.
-                    if v_other is None and v_self is not None and type(v_self) is not (
-                            list,) and v_self.t == 0 and v_self.guard is None:
-                        same_value = True
+                            values.append(m._concrete_memory[addr])
 
-                    # Symmetric case. We need to insert in self.
-                    if v_self is None and v_other is not None and type(v_other) is not (
-                            list,) and v_other.t == 0 and v_other.guard is None:
-                        self._concrete_memory[page_index * 0x1000 + offset] = v_other
-                        same_value = True
+                    same_value = all(self._same_concrete_value(v, values[0]) for v in values[1:])
 
-                    if page_index * 0x1000 + offset == 134561792:
-                        # pdb.set_trace()
-                        pass
+                    # an initialized value that is missing in other memories
+                    # can be kept as it is.
+                    if not same_value:
+                        initialized = [v for v in values if v is not None]
+                        if type(initialized[0]) is not list and initialized[0].t == 0 \
+                                and initialized[0].guard is None \
+                                and all(self._same_concrete_value(v, initialized[0]) for v in initialized[1:]):
+                            if values[0] is None:
+                                self._concrete_memory[addr] = initialized[0]
+                            same_value = True
 
                     if not same_value:
                         count += 1
-                        merged_value = self._copy_symbolic_items_and_apply_guard(v_self, merge_conditions[0]) \
-                                       + self._copy_symbolic_items_and_apply_guard(v_other, merge_conditions[1])
+                        merged_value = []
+                        for v, condition in zip(values, merge_conditions):
+                            merged_value += self._copy_symbolic_items_and_apply_guard(v, condition)
                         assert len(merged_value) > 0
-                        self._concrete_memory[page_index * 0x1000 + offset] = merged_value if len(merged_value) > 1 else \
-                            merged_value[0]
+                        self._concrete_memory[addr] = merged_value if len(merged_value) > 1 else merged_value[0]
 
             # end_time = time.time()
             # print "Merge concrete: " + str(end_time-start_time)
@@ -1443,6 +1739,29 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
         except Exception as e:
             pdb.set_trace()
 
+    def _same_concrete_value(self, v_a, v_b):
+
+        if type(v_a) not in (list,) and type(v_b) not in (list,):
+
+            if v_a is not None and v_b is not None:
+                assert v_a.addr == v_b.addr
+
+            return v_a == v_b
+
+        if type(v_a) != type(v_b) or len(v_a) != len(v_b):
+            return False
+
+        for k in range(len(v_a)):  # we only get equality when items are in the same order
+
+            assert type(v_a[k]) not in (list,)
+            assert type(v_b[k]) not in (list,)
+            assert v_a[k].addr == v_b[k].addr
+
+            if v_a[k] != v_b[k]:
+                return False
+
+        return True
+
     def _copy_symbolic_items_and_apply_guard(self, L, guard):
         if L is None:
             return []
@@ -1451,12 +1770,14 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
         LL = []
         for l in L:
             l = l.copy()
-            l.guard = claripy.And(l.guard, guard) if l.guard is not None else guard
+            # interned: items with the same guard share the merged guard,
+            # so that bytes from the same source still form a run
+            l.guard = self._guard_table.conjunction(l.guard, guard)
             LL.append(l)
         return LL
 
     @profile
-    def _merge_symbolic_memory(self, other, merge_conditions, ancestor_timestamp, ancestor_timestamp_implicit, verbose=False):
+    def _merge_symbolic_memory(self, others, merge_conditions, ancestor_timestamp, ancestor_timestamp_implicit, verbose=False):
 
         if self.verbose: self.log("Merging symbolic addresses...")
 
@@ -1471,30 +1792,33 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
             error = None
 
             try:
-                P = self._symbolic_memory.search(0, sys.maxint)
+                P, overwritten = self._symbolic_writes_since(ancestor_timestamp, ancestor_timestamp_implicit)
                 for p in P:
-                    # assert p.data.t >= 0
-                    if (p.data.t > 0 and p.data.t >= ancestor_timestamp) or (
-                                    p.data.t < 0 and p.data.t <= ancestor_timestamp_implicit):
-                        guard = claripy.And(p.data.guard, merge_conditions[0]) if p.data.guard is not None else \
-                            merge_conditions[0]
-                        i = MemoryItem(p.data.addr, p.data.obj, p.data.t, guard)
-                        self._symbolic_memory.update_item(p, i)
+                    guard = self._guard_table.conjunction(p.data.guard, merge_conditions[0])
+                    i = MemoryItem(p.data.addr, p.data.obj, p.data.t, guard, p.data.size)
+                    self._symbolic_update(p, i)
+                    count += 1
+
+                # items of the ancestor replaced by this memory are still there in the others
+                if len(overwritten) > 0:
+                    others_condition = merge_conditions[1] if len(merge_conditions) == 2 else \
+                        claripy.Or(*merge_conditions[1:])
+                    for p in overwritten:
+                        guard = self._guard_table.conjunction(p.data.guard, others_condition)
+                        i = MemoryItem(p.data.addr, p.data.obj, p.data.t, guard, p.data.size)
+                        self._symbolic_add(p.begin, p.end, i)
                         count += 1
             except Exception as e:
                 error = 1
                 pdb.set_trace()
 
             try:
-                P = other._symbolic_memory.search(0, sys.maxint)
-                for p in P:
-                    # assert p.data.t >= 0
-                    if (p.data.t > 0 and p.data.t >= ancestor_timestamp) or (
-                                    p.data.t < 0 and p.data.t <= ancestor_timestamp_implicit):
-                        guard = claripy.And(p.data.guard, merge_conditions[1]) if p.data.guard is not None else \
-                            merge_conditions[1]
-                        i = MemoryItem(p.data.addr, p.data.obj, p.data.t, guard)
-                        self._symbolic_memory.add(p.begin, p.end, i)
+                for other, condition in zip(others, merge_conditions[1:]):
+                    P = other._symbolic_items_since(ancestor_timestamp, ancestor_timestamp_implicit)
+                    for p in P:
+                        guard = self._guard_table.conjunction(p.data.guard, condition)
+                        i = MemoryItem(p.data.addr, p.data.obj, p.data.t, guard, p.data.size)
+                        self._symbolic_add(p.begin, p.end, i)
                         count += 1
             except Exception as e:
                 error = 2
@@ -1713,24 +2037,11 @@ class SymbolicMemory(angr.state_plugins.plugin.SimStatePlugin):
         else:
             addr = self.state.se.eval(addr)
 
-        # concrete address
-        if type(addr) in (int, long):
-            min_addr = addr
-            max_addr = addr
-
-        # symbolic addr
-        else:
-            min_addr = self.state.se.min_int(addr)
-            max_addr = self.state.se.max_int(addr)
-            if min_addr == max_addr:
-                addr = min_addr
+        addr, min_addr, max_addr = self._resolve_addr_range(addr)
 
         # check permissions
         self.check_sigsegv_and_refine(addr, min_addr, max_addr, False)
 
-        # check if binary data should be loaded into address space
-        self._load_init_data(min_addr, (max_addr - min_addr) + 1)
-
         P = self._concrete_memory.find(min_addr, max_addr, True)
 
         P += [x.data for x in self._symbolic_memory.search(min_addr, max_addr + 1)]
@@ -3,7 +3,7 @@ import logging
 
 from executor import executor
 from memory import factory
-from memory import range_fully_symbolic_memory
+from memory.lib import profiling, solver_stats
 from utils import parse_args
 
 if __name__ == '__main__':
@@ -23,5 +23,8 @@ if __name__ == '__main__':
 
     explorer.run(mem_memory = mem_memory, reg_memory = reg_memory)
 
-    if t == 1 and range_fully_symbolic_memory.profiling_enabled:
-        range_fully_symbolic_memory.print_profiling_time_stats()
\ No newline at end of file
+    if t == 1 and profiling.is_enabled():
+        profiling.report()
+
+    if t == 1 and solver_stats.is_enabled():
+        solver_stats.report()
\ No newline at end of file
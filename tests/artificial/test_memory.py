@@ -5,7 +5,10 @@ import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 
+from executor import merging, parallel
 from memory import factory
+from memory import range_fully_symbolic_memory
+from memory.lib import load_cache, paged_memory, profiling, solver_stats
 
 
 def check(state, obj, exp_values, conditions=()):
@@ -111,6 +114,329 @@ def test_concrete_merge(state):
     r2 = s3.se.any_n_int(res, 2, extra_constraints=(guard <= 0,))
     assert len(r2) == 1 and r2[0] == 0x01060304
 
+def test_concrete_merge_changed_offsets(state):
+
+    for k in range(0x100):
+        state.memory.store(0x1000 + k, claripy.BVV(k, 8))
+
+    s1 = state.copy()
+    s2 = state.copy()
+
+    s1.memory.store(0x1001, claripy.BVV(0x05, 8))
+    s2.memory.store(0x1010, claripy.BVV(0x06, 8))
+    s2.memory.store(0x1011, claripy.BVV(0x11, 8))
+
+    # only offsets written after the fork are compared
+    pages = [s1.memory._concrete_memory._pages[1], s2.memory._concrete_memory._pages[1]]
+    assert paged_memory.changed_offsets(pages) == set([0x1, 0x10, 0x11])
+
+    # 0x1011 is rewritten with the same byte but a newer timestamp: it differs too
+    s3 = s1.copy()
+    guard = claripy.BVS('guard', 32)
+    assert s3.memory.merge([s2.memory], [guard > 0, guard <= 0], state.memory) == 3
+
+    res = s3.memory.load(0x1000, 2)
+    check(s3, res, [0x0005], (guard > 0,))
+    check(s3, res, [0x0001], (guard <= 0,))
+
+def test_concrete_merge_runs(state):
+
+    s1 = state.copy()
+    s2 = state.copy()
+
+    b1 = claripy.BVS('b1', 64)
+    b2 = claripy.BVS('b2', 64)
+    s1.memory.store(0x2000, b1)
+    s2.memory.store(0x2000, b2)
+
+    s3 = s1.copy()
+    guard = claripy.BVS('guard', 32)
+    s3.memory.merge([s2.memory], [guard > 0, guard <= 0], state.memory)
+
+    # the bytes of each buffer share one guard: one ite for the whole load
+    # (at most one case for each buffer, claripy may fold the last one)
+    res = s3.memory.load(0x2000, 8)
+    assert res.op == 'If' and len([a for a in res.recursive_children_asts if a.op == 'If']) <= 1
+
+    # bytes already sliced (e.g., by an earlier load) still form a run
+    s4 = s1.copy()
+    s1.memory.load(0x2000, 1)
+    s4.memory.merge([s2.memory], [guard > 0, guard <= 0], state.memory)
+    assert s4.memory.load(0x2000, 8).op == 'If'
+
+    assert not s3.se.satisfiable(extra_constraints=(guard > 0, res != b1))
+    assert not s3.se.satisfiable(extra_constraints=(guard <= 0, res != b2))
+
+def test_concrete_merge_image(state):
+
+    # untouched pages are read from the binary image
+    addr = state.project.loader.main_object.min_addr
+    index = addr / paged_memory.PagedMemory.PAGE_SIZE
+    assert index not in state.memory._concrete_memory._pages
+    check(state, state.memory.load(addr, 4), [0x7f454c46])  # ELF magic
+    assert index not in state.memory._concrete_memory._pages
+
+    s1 = state.copy()
+    s2 = state.copy()
+    s1.memory.store(addr + 1, claripy.BVV(0x55, 8))
+    assert index in s1.memory._concrete_memory._pages and index not in s2.memory._concrete_memory._pages
+
+    # the page is missing on one side of the merge: that side is the image
+    guard = claripy.BVS('guard', 32)
+    s3 = s1.copy()
+    assert s3.memory.merge([s2.memory], [guard > 0, guard <= 0], state.memory) == 1
+    s4 = s2.copy()
+    assert s4.memory.merge([s1.memory], [guard <= 0, guard > 0], state.memory) == 1
+
+    for s in (s3, s4):
+        res = s.memory.load(addr, 4)
+        check(s, res, [0x7f554c46], (guard > 0,))
+        check(s, res, [0x7f454c46], (guard <= 0,))
+
+def test_guard_interning(state):
+
+    table = state.memory._guard_table
+
+    a = claripy.BVS('ga', 32) > 0
+    b = claripy.BVS('gb', 32) > 0
+    c = claripy.BVS('gc', 32) > 0
+
+    # same conditions, in any order and nesting: same guard object
+    g = table.conjunction(table.conjunction(a, b), c)
+    assert g is table.conjunction(table.conjunction(c, a), b)
+    assert g is table.conjunction(g, a)
+    assert g.op == 'And' and len(g.args) == 3
+
+    assert table.conjunction(None, a) is a
+
+    # two merges in a row: items merged under the same conditions share the guard
+    state.memory.store(0x0, claripy.BVV(0x01020304, 32))
+    s1 = state.copy()
+    s2 = state.copy()
+    s1.memory.store(0x0, claripy.BVV(0x05060708, 32))
+    s3 = s1.copy()
+    s3.memory.merge([s2.memory], [a, claripy.Not(a)], state.memory)
+
+    s4 = s3.copy()
+    s5 = s3.copy()
+    s4.memory.store(0x0, claripy.BVV(0x090a0b0c, 32))
+    s6 = s4.copy()
+    s6.memory.merge([s5.memory], [b, claripy.Not(b)], s3.memory)
+
+    P = [s6.memory._concrete_memory[0x0 + k] for k in range(4)]
+    assert all(type(p) in (list,) and len(p) == 3 for p in P)
+    for i in range(3):
+        assert all(p[i].guard is P[0][i].guard for p in P)
+    assert P[0][1].guard.op == 'And' and len(P[0][1].guard.args) == 2
+
+    res = s6.memory.load(0x0, 4)
+    check(s6, res, [0x090a0b0c], (b,))
+    check(s6, res, [0x05060708], (a, claripy.Not(b)))
+    check(s6, res, [0x01020304], (claripy.Not(a), claripy.Not(b)))
+
+def test_n_way_merge(state):
+
+    val = 0x01020304
+    state.memory.store(0x0, claripy.BVV(val, 32))
+
+    a = claripy.BVS('a', 64)
+    state.se.add(a <= 2)
+
+    states = []
+    for k in range(4):
+        s = state.copy()
+        s.memory.store(0x1, claripy.BVV(0x10 + k, 8))
+        s.memory.store(a, claripy.BVV(0x20 + k, 8))
+        states.append(s)
+
+    s = states[0].copy()
+    guard = claripy.BVS('guard', 32)
+    conditions = [guard == k for k in range(3)] + [guard > 2]
+    s.memory.merge([o.memory for o in states[1:]], conditions, state.memory)
+
+    # a single guard for each item
+    P = s.memory._concrete_memory[0x1]
+    assert type(P) in (list,) and len(P) == 4
+    assert all(p.guard is c for p, c in zip(P, conditions))
+
+    res = s.memory.load(0x0, 4)
+    for k in range(4):
+        check(s, res, [0x20100304 + k * 0x01010000], (conditions[k], a == 0))
+        check(s, res, [0x01102004 + k * 0x00010100], (conditions[k], a == 2))
+
+def test_merge_cost(state):
+
+    state.memory.store(0x0, claripy.BVV(0x01020304, 32))
+
+    s1 = state.copy()
+    s2 = state.copy()
+
+    # nothing written since the fork
+    assert s1.memory.merge_cost([s2.memory], state.memory) == 0
+
+    s1.memory.store(0x1, claripy.BVV(0x05, 8))
+    s2.memory.store(0x1, claripy.BVV(0x06, 8))
+    cost = s1.memory.merge_cost([s2.memory], state.memory)
+    assert cost == 2
+
+    # symbolic items are guarded for all the addresses they cover
+    a = claripy.BVS('a', 64)
+    s2.se.add(a <= 7)
+    s2.memory.store(a, claripy.BVV(0x07, 8))
+    assert s1.memory.merge_cost([s2.memory], state.memory) == cost + 8
+
+def test_cost_aware_merging(state):
+
+    # the two states need a common ancestor in their history
+    base = state.project.factory.simgr(state).step().active[0]
+    x = claripy.BVS('x', 32)
+
+    for threshold in (1, 10 ** 6):
+
+        s1 = base.copy()
+        s2 = base.copy()
+        s1.add_constraints(x > 0)
+        s2.add_constraints(x <= 0)
+        s1.memory.store(0x1000, claripy.BVV(1, 128))
+        s2.memory.store(0x1000, claripy.BVV(2, 128))
+
+        technique = merging.CostAwareMerging(threshold)
+        sm = state.project.factory.simgr([s1, s2])
+        sm.use_technique(technique)
+        sm.step()
+
+        if threshold == 1:
+            # 16 bytes differ: the cost is over the threshold
+            assert technique.refused == 1 and technique.merged == 0 and len(sm.active) == 2
+        else:
+            assert technique.refused == 0 and technique.merged == 1 and len(sm.active) == 1
+            s = sm.active[0]
+            res = s.memory.load(0x1000, 16)
+            check(s, res, [1], (x > 0,))
+            check(s, res, [2], (x <= 0,))
+
+def test_profiling(state):
+
+    range_fully_symbolic_memory.enable_profiling()
+    try:
+        state.memory.store(0x0, claripy.BVV(0x01020304, 32))
+        state.memory.load(0x0, 4)
+
+        stats = profiling.stats()
+        ncall, inclusive, exclusive = stats['SymbolicMemory.load']
+        assert ncall >= 1 and 0 <= exclusive <= inclusive
+        # callees are direct: load queries the concrete memory through _load_candidates
+        assert 'SymbolicMemory._load_candidates' in profiling.callees('SymbolicMemory.load')
+        assert 'PagedMemory.find' in profiling.callees('SymbolicMemory._load_candidates')
+        assert 'PagedMemory.find' not in profiling.callees('SymbolicMemory.load')
+    finally:
+        profiling.disable()
+        profiling.reset()
+
+    # disabled: the original functions are back, nothing is recorded
+    assert paged_memory.PagedMemory.__dict__['find'].func_code.co_name == 'find'
+    state.memory.load(0x0, 4)
+    assert len(profiling.stats()) == 0
+
+def test_solver_stats(state):
+
+    import json, tempfile
+    trace = tempfile.NamedTemporaryFile(suffix='.jsonl')
+
+    range_fully_symbolic_memory.enable_solver_stats(trace.name)
+    try:
+        # too wide for the cheap bounds: the range of a is asked to the solver
+        a = claripy.BVS('a', 64)
+        state.se.add(a <= 0x10000)
+        state.memory.store(a, claripy.BVV(0x01, 8))
+        state.se.satisfiable()  # not from the memory: not recorded
+
+        calls = solver_stats.calls()
+        assert len(calls) > 0 and all(op in ('store', 'sigsegv') for (op, method) in calls)
+        ops = solver_stats.operations()
+        assert ops['store'][0] == 1 and sum(s[2] for s in ops.values()) > 0
+    finally:
+        solver_stats.disable()
+
+    records = [json.loads(line) for line in open(trace.name)]
+    assert len(records) == sum(c[0] for c in calls.values()) and \
+           all(r['op'] in ('store', 'sigsegv') and r['constraints'] >= 1 for r in records)
+    solver_stats.reset()
+
+def test_telemetry(state):
+
+    t0 = state.memory.telemetry()
+    state.memory.store(0x0, claripy.BVV(0x01020304, 32))
+    t1 = state.memory.telemetry()
+    assert t1['concrete_items'] == t0['concrete_items'] + 4
+
+    s = state.copy()
+    s.memory.store(0x2, claripy.BVV(0x0506, 16))
+    a = claripy.BVS('a', 64)
+    s.se.add(a <= 7)
+    s.memory.store(a, claripy.BVV(0x07, 8))
+    t2 = s.memory.telemetry()
+    assert t2['concrete_items'] == t1['concrete_items'] and \
+           t2['symbolic_items'] == t1['symbolic_items'] + 1 and t2['symbolic_pages'] >= 1
+    assert state.memory.telemetry() == t1
+
+    # the running count matches the pages, also after loading image pages, merging and deleting
+    addr = state.project.loader.main_object.min_addr
+    s.memory.store(addr, claripy.BVV(0, 8))
+    m = state.copy()
+    m.memory.merge([s.memory], [a > 3, a <= 3], state.memory)
+    del m.memory._concrete_memory[0x0]
+    for mem in (state.memory, s.memory, m.memory):
+        pages = mem._concrete_memory._pages
+        assert len(mem._concrete_memory) == sum(len(pages[k]) for k in pages.keys())
+    assert len(m.memory._concrete_memory) == len(s.memory._concrete_memory) - 1
+
+def test_serialization(state):
+
+    state.memory.store(0x0, claripy.BVV(0x01020304, 32))
+    a = claripy.BVS('a', 64)
+    state.se.add(a <= 7)
+    state.memory.store(a, claripy.BVV(0x07, 8))
+
+    serializer = parallel.StateSerializer(parallel.StateSerializer.shared_objects(state.project, state))
+    s = serializer.loads(serializer.dumps([state]))[0]
+
+    # objects inherited through fork are referenced, not copied
+    assert s.memory._image is state.memory._image and s.project is state.project
+    # plugins are given a weak proxy of the state
+    assert s.memory.state.memory is s.memory
+
+    assert len(s.memory._symbolic_items_since(0, 0)) == len(state.memory._symbolic_items_since(0, 0)) == 1
+    check(s, s.memory.load(0x0, 4), state.se.any_n_int(state.memory.load(0x0, 4), 16))
+
+def test_batch_serialization(state):
+
+    state.memory.store(0x0, claripy.BVV(0x01020304, 32))
+    a = claripy.BVS('a', 64)
+    state.se.add(a <= 7)
+    state.memory.store(a, claripy.BVV(0x07, 8))
+    state.memory.store(0x100, claripy.BVV(0x01, 8))
+
+    s = state.copy()
+    s.memory.store(0x2000, claripy.BVV(0x05, 8))
+    s.memory.store(a + 1, claripy.BVV(0x08, 8))
+
+    serializer = parallel.StateSerializer(parallel.StateSerializer.shared_objects(state.project, state))
+    batch = serializer.dumps([state, s])
+    assert len(batch) < len(serializer.dumps([state])) + len(serializer.dumps([s]))
+
+    l1, l2 = serializer.loads(batch)
+
+    # what was shared is still shared, and still copied on write
+    assert l1.memory._concrete_memory._pages.get(0) is l2.memory._concrete_memory._pages.get(0)
+    assert l2.memory._symbolic_log[4] is l1.memory._symbolic_log
+    assert l1.memory._guard_table is l2.memory._guard_table
+
+    l2.memory.store(0x100, claripy.BVV(0x09, 8))
+    check(l1, l1.memory.load(0x100, 1), [0x01])
+    check(l2, l2.memory.load(0x100, 1), [0x09])
+    check(l2, l2.memory.load(0x2000, 1), [0x05])
+
 def test_concrete_merge_with_condition(state):
 
     val = 0x01020304
@@ -223,6 +549,175 @@ def test_symbolic_access(state):
     assert len(res) == 1 and res[0] == val
 
 
+def test_symbolic_merge_write_log(state):
+
+    a = claripy.BVS('a', 64)
+    state.se.add(a <= 0x10)
+    for k in range(8):
+        state.memory.store(a + k, claripy.BVV(k, 8))
+    state.memory.store(0x100, claripy.BVV(0x0, 8))
+
+    s1 = state.copy()
+    s1.memory.store(a, claripy.BVV(0x20, 8))
+
+    s2 = state.copy()
+    s2.memory.store(a + 1, claripy.BVV(0x21, 8))
+
+    # only the items written after the fork are enumerated
+    t, t_implicit = state.history.timestamps
+    P = s1.memory._symbolic_items_since(t, t_implicit)
+    assert len(P) == 1 and s1.se.any_int(P[0].data.obj) == 0x20
+
+    # the item of the ancestor at a has been replaced in s1, not in s2
+    P, overwritten = s1.memory._symbolic_writes_since(t, t_implicit)
+    assert len(overwritten) == 1 and s1.se.any_int(overwritten[0].data.obj) == 0x00
+
+    s3 = s1.copy()
+    guard = claripy.BVS('guard', 32)
+    assert s3.memory.merge([s2.memory], [guard > 1, guard <= 1], state.memory) == 3
+
+    # the log is cut at the merge: s3 is the ancestor of the next merges
+    assert s3.memory._symbolic_log is None
+
+    res = s3.memory.load(a, 2)
+    check(s3, res, [0x2001], (guard > 1,))
+    check(s3, res, [0x0021], (guard <= 1,))
+
+    s4 = s3.copy()
+    s4.memory.store(a + 2, claripy.BVV(0x22, 8))
+    t, t_implicit = s3.history.timestamps
+    assert len(s4.memory._symbolic_items_since(t, t_implicit)) == 1
+    # older ancestors: the tree is scanned
+    assert len(s4.memory._symbolic_items_since(0, 0)) == len(s4.memory._symbolic_memory.search(0, sys.maxint))
+
+def test_multi_byte_symbolic_store(state):
+
+    val = 0x01020304
+    state.memory.store(0x0, claripy.BVV(val, 32))
+
+    addr = claripy.BVS('addr', 64)
+    state.se.add(addr <= 2)
+
+    n = state.memory._symbolic_memory._num_inter
+    state.memory.store(addr, claripy.BVV(0x0506, 16), 2)
+    assert state.memory._symbolic_memory._num_inter == n + 1
+
+    res = state.memory.load(addr, 2)
+    check(state, res, [0x0506])
+
+    res = state.memory.load(addr + 1, 1)
+    check(state, res, [0x06])
+
+    res = state.memory.load(0x1, 1)
+    check(state, res, [0x05], (addr == 1,))
+    check(state, res, [0x06], (addr == 0,))
+    check(state, res, [0x02], (addr == 2,))
+
+    res = state.memory.load(0x0, 4)
+    check(state, res, [0x05060304], (addr == 0,))
+    check(state, res, [0x01020506], (addr == 2,))
+
+def test_load_cache(state):
+
+    state.memory._load_cache = load_cache.LoadCache()
+
+    state.memory.store(0x10, claripy.BVV(0x01020304, 32))
+
+    addr = claripy.BVS('addr', 64)
+    state.se.add(addr >= 0x10)
+    state.se.add(addr <= 0x12)
+
+    res = state.memory.load(addr, 2)
+    assert state.memory.load(addr, 2) is res
+    check(state, res, [0x0102, 0x0203, 0x0304])
+
+    # child states inherit the entries of their parent
+    child = state.copy()
+    assert child.memory.load(addr, 2) is res
+    assert child.memory._load_cache._entries is state.memory._load_cache._entries
+
+    # an overlapping store invalidates the entry only in the child, which copies the tables
+    child.memory.store(0x13, claripy.BVV(0x05, 8))
+    assert child.memory._load_cache._entries is not state.memory._load_cache._entries
+    res_child = child.memory.load(addr, 2)
+    assert res_child is not res
+    check(child, res_child, [0x0102, 0x0203, 0x0305])
+    assert state.memory.load(addr, 2) is res
+
+    # a store outside the range does not
+    state.memory.store(0x20, claripy.BVV(0x06, 8))
+    assert state.memory.load(addr, 2) is res
+
+def test_address_range_cache(state):
+
+    cache = state.memory._address_range_cache
+
+    # signed bounds: not handled by the interval analysis, and a range
+    # too wide for its bounds (added by the solver) to be used
+    addr = claripy.BVS('addr', 64)
+    state.se.add(claripy.SGE(addr, 0x10))
+    state.se.add(claripy.SLE(addr, 0x20000))
+
+    state.memory.load(addr, 1)
+    misses = cache.misses
+    hits = cache.hits
+    refinements = cache.refinements
+
+    state.memory.store(addr, claripy.BVV(0x01, 8))
+    assert cache.misses == misses and cache.hits == hits + 1
+
+    # copies share the cache
+    child = state.copy()
+    assert child.memory._address_range_cache is cache
+
+    # added constraints: refine the cached range
+    child.se.add(claripy.SLE(addr, 0x18))
+    res = child.memory.load(addr, 1)
+    assert cache.refinements == refinements + 1 and cache.misses == misses
+    check(child, res, [0x01])
+
+    child.se.add(claripy.SGE(addr, 0x12))
+    assert cache.resolve(child.se, addr) == (0x12, 0x18)
+    assert cache.refinements == refinements + 2
+
+def test_interval_bounds(state):
+
+    cache = state.memory._address_range_cache
+
+    base = 0x1000
+    for k in range(8):
+        state.memory.store(base + 8 * k, claripy.BVV(k, 64))
+
+    i = claripy.BVS('i', 32)
+    state.se.add(i < 8)
+    addr = base + (i.zero_extend(32) << 3)
+
+    # bounds checked with two satisfiability queries instead of min/max
+    misses = cache.misses
+    refinements = cache.refinements
+    assert state.memory._resolve_addr_range(addr)[1:] == (base, base + 56)
+    assert cache.misses == misses and cache.refinements == refinements + 1
+
+    res = state.memory.load(addr, 8)
+    assert cache.misses == misses
+    check(state, res, [0x0, 0x1, 0x2, 0x3, 0x4, 0x5, 0x6, 0x7])
+    check(state, res, [0x3], (i == 3,))
+
+    # loose bounds: [base, base + 0xff], but a single solution, which becomes the address
+    s = state.copy()
+    x = claripy.BVS('x', 8)
+    s.se.add(x * 3 == 9)
+    addr = base + x.zero_extend(56)
+    assert s.memory._resolve_addr_range(addr) == (base + 3, base + 3, base + 3)
+    s.memory.store(addr, claripy.BVS('v', 64))
+    res = s.memory.load(addr, 8)
+    assert not any(a.op == 'If' for a in [res] + list(res.recursive_children_asts))
+
+    # loose bounds and two solutions (x = 3 or x = 131): the exact range
+    s = state.copy()
+    s.se.add(x * 2 == 6)
+    assert s.memory._resolve_addr_range(addr)[1:] == (base + 3, base + 131)
+
 def test_same_operator(state):
 
     a = claripy.BVS('a', 8)
@@ -281,10 +776,27 @@ if __name__ == '__main__':
     test_store_with_symbolic_addr_and_symbolic_size(state.copy())
 
     test_concrete_merge(state.copy())
+    test_concrete_merge_changed_offsets(state.copy())
+    test_concrete_merge_runs(state.copy())
+    test_concrete_merge_image(state.copy())
+    test_n_way_merge(state.copy())
+    test_guard_interning(state.copy())
+    test_merge_cost(state.copy())
+    test_cost_aware_merging(state.copy())
     test_concrete_merge_with_condition(state.copy())
 
     test_symbolic_merge(state.copy())
+    test_symbolic_merge_write_log(state.copy())
 
     if t == 1:
+        test_multi_byte_symbolic_store(state.copy())
+        test_load_cache(state.copy())
+        test_address_range_cache(state.copy())
+        test_interval_bounds(state.copy())
+        test_profiling(state.copy())
+        test_solver_stats(state.copy())
+        test_telemetry(state.copy())
+        test_serialization(state.copy())
+        test_batch_serialization(state.copy())
         test_same_operator(state.copy())
 
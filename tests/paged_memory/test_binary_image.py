@@ -0,0 +1,48 @@
+import os, sys, traceback
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../pitree'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+
+from bcolors import bcolors
+from memory.lib.binary_image import *
+
+PAGE = BinaryImage.PAGE_SIZE
+
+def test_1(): # reads across gaps return one chunk per segment
+    img = BinaryImage([(0x2000, 'abcd'), (0x1000, 'xy'), (0x2010, 'zz'), (0x3000, '')])
+    assert len(img) == 8
+    assert img.read(0x1000, 2) == [(0x1000, 'xy')]
+    assert img.read(0x1001, 0x1010) == [(0x1001, 'y'), (0x2000, 'abcd'), (0x2010, 'z')]
+    assert img.read(0x2002, 0x20) == [(0x2002, 'cd'), (0x2010, 'zz')]
+    assert img.read(0x1002, 0xffe) == [] and img.read(0x2004, 0xc) == [] and img.read(0x3000, 0x10) == []
+    assert img.read(0, 0x1001) == [(0x1000, 'x')]
+
+def test_2(): # overlapping segments: the first one wins
+    img = BinaryImage([(0x1004, 'EFGHIJ'), (0x1000, 'abcdef'), (0x1001, 'ZZ'), (0x1000, 'QQQQQQQQ')])
+    assert img.read(0x1000, 0x10) == [(0x1000, 'abcdef'), (0x1006, 'QQ'), (0x1008, 'IJ')]
+    assert img.read(0x1001, 6) == [(0x1001, 'bcdef'), (0x1006, 'Q')]
+    assert len(img) == 10
+
+def test_3(): # reads and page indexes across page boundaries
+    img = BinaryImage([(PAGE - 2, 'abcd'), (5 * PAGE, 'x' * (2 * PAGE + 1)), (9 * PAGE + 7, 'y')])
+    assert img.read(0, PAGE) == [(PAGE - 2, 'ab')]
+    assert img.read(PAGE, PAGE) == [(PAGE, 'cd')]
+    assert img.read(6 * PAGE - 1, 2) == [(6 * PAGE - 1, 'xx')]
+    assert img.page_indexes(0, 10) == [0, 1, 5, 6, 7, 9]
+    assert img.page_indexes(1, 6) == [1, 5, 6]
+    assert img.page_indexes(2, 4) == [] and img.page_indexes(8, 8) == [] and img.page_indexes(7, 7) == [7]
+
+def test_4(): # empty image
+    img = BinaryImage([])
+    assert len(img) == 0 and img.read(0, 0x1000) == [] and img.page_indexes(0, 10) == []
+
+if __name__ == "__main__":
+    for k, test in enumerate([test_1, test_2, test_3, test_4]):
+        print "- Test " + str(k + 1)
+        try:
+            test()
+        except:
+            print bcolors.FAIL + "  Not passed" + bcolors.ENDC
+            traceback.print_exc(file=sys.stderr)
+            sys.exit(1)
+        print bcolors.OKGREEN + "  Passed" + bcolors.ENDC + "\n"
@@ -0,0 +1,94 @@
+import os, sys, traceback
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../pitree'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+
+import claripy
+from bcolors import bcolors
+from memory.lib.paged_memory import *
+from memory.range_fully_symbolic_memory import MemoryItem
+
+BASE = 0x601000
+
+def item(offset, obj, t=0, guard=None):
+    return MemoryItem(BASE + offset, obj, t, guard)
+
+def test_1(): # concrete bytes are kept in the bytearray, timestamps only if non-zero
+    p = ConcretePage(BASE)
+    p[0] = item(0, claripy.BVV(0x41, 8))
+    p[1] = item(1, claripy.BVV(0x42, 8), t=7)
+    p[2] = item(2, [claripy.BVV(0x11223344, 32), 3], t=-3)
+    assert len(p._items) == 0 and p._timestamps == {1: 7, 2: -3}
+    assert p[0].obj.args[0] == 0x41 and p[0].t == 0 and p[0].addr == BASE and \
+           p[1].obj.args[0] == 0x42 and p[1].t == 7 and \
+           p[2].obj.args[0] == 0x44 and p[2].t == -3 and \
+           0 in p and 3 not in p and p.get(3) is None and len(p) == 3
+
+def test_2(): # symbolic, guarded and list values go to the side dict
+    p = ConcretePage(BASE)
+    x = claripy.BVS('x', 8)
+    a = item(4, x, t=5)
+    b = item(5, claripy.BVV(1, 8), t=6, guard=claripy.BoolS('g'))
+    c = [item(6, claripy.BVV(2, 8)), item(6, x, t=1)]
+    p[4] = a
+    p[5] = b
+    p[6] = c
+    assert p[4] is a and p[5] is b and p[6] is c and len(p._timestamps) == 0 and \
+           set(p.keys()) == set([4, 5, 6]) and len(p) == 3
+
+def test_3(): # overwrites move values between the bytearray and the side dict
+    p = ConcretePage(BASE)
+    x = claripy.BVS('x', 8)
+    p[8] = item(8, claripy.BVV(1, 8), t=2)
+    p[8] = item(8, x, t=3)
+    assert p[8].obj is x and 8 not in p._timestamps and len(p) == 1
+    p[8] = item(8, claripy.BVV(9, 8))
+    assert p[8].obj.args[0] == 9 and p[8].t == 0 and 8 not in p._items and len(p._timestamps) == 0 and len(p) == 1
+    p[9] = item(9, claripy.BVV(1, 8), t=4)
+    p[9] = item(9, claripy.BVV(2, 8), t=5)
+    assert p[9].t == 5 and len(p) == 2
+
+def test_4(): # del
+    p = ConcretePage(BASE)
+    p[1] = item(1, claripy.BVV(1, 8), t=4)
+    p[2] = item(2, claripy.BVS('x', 8))
+    del p[1]
+    del p[2]
+    assert 1 not in p and 2 not in p and len(p) == 0 and len(p._timestamps) == 0 and len(p._items) == 0
+    try:
+        del p[1]
+        assert False
+    except KeyError:
+        pass
+
+def test_5(): # init_bytes does not overwrite values and sets timestamp zero
+    p = ConcretePage(BASE)
+    p[1] = item(1, claripy.BVV(0xaa, 8), t=4)
+    p.init_bytes(0, 'xyz')
+    assert p[0].obj.args[0] == ord('x') and p[1].obj.args[0] == 0xaa and p[1].t == 4 and \
+           p[2].t == 0 and len(p) == 3
+
+def test_6(): # copies do not see each other's writes
+    p = ConcretePage(BASE)
+    x = claripy.BVS('x', 8)
+    p[0] = item(0, claripy.BVV(1, 8), t=1)
+    p[1] = item(1, x)
+    q = p.copy()
+    q[0] = item(0, claripy.BVV(2, 8), t=2)
+    q[2] = item(2, claripy.BVV(3, 8), t=3)
+    del q[1]
+    p[3] = item(3, x)
+    assert p[0].obj.args[0] == 1 and p[0].t == 1 and 1 in p and 2 not in p and 3 in p and len(p) == 3
+    assert q[0].obj.args[0] == 2 and q[0].t == 2 and 1 not in q and q[2].t == 3 and 3 not in q and len(q) == 2
+    assert q.lineage.parent is p.lineage
+
+if __name__ == "__main__":
+    for k, test in enumerate([test_1, test_2, test_3, test_4, test_5, test_6]):
+        print "- Test " + str(k + 1)
+        try:
+            test()
+        except:
+            print bcolors.FAIL + "  Not passed" + bcolors.ENDC
+            traceback.print_exc(file=sys.stderr)
+            sys.exit(1)
+        print bcolors.OKGREEN + "  Passed" + bcolors.ENDC + "\n"
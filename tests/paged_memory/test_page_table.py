@@ -0,0 +1,54 @@
+import os, sys, traceback
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../pitree'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+
+from bcolors import bcolors
+from memory.lib.page_table import *
+
+def test_1():
+    t = PageTable()
+    t[1] = 'a'
+    t[1 + WIDTH] = 'b'
+    t[0x7ffffffff] = 'c'
+    assert len(t) == 3 and t[1] == 'a' and t[1 + WIDTH] == 'b' and t[0x7ffffffff] == 'c' and \
+           2 not in t and t.get(2) is None and set(t.keys()) == set([1, 1 + WIDTH, 0x7ffffffff])
+
+def test_2(): # copy shares everything until written
+    t = PageTable()
+    for k in range(1000):
+        t[k * 7] = k
+    tt = t.copy()
+    assert tt._root is t._root and not t.is_owned(7) and not tt.is_owned(7)
+
+def test_3(): # writes after copy are not visible in the other table
+    t = PageTable()
+    for k in range(1000):
+        t[k * 7] = k
+    tt = t.copy()
+    tt[7] = 'tt'
+    tt[1] = 'new'
+    t[14] = 't'
+    assert t[7] == 1 and t[14] == 't' and 1 not in t and len(t) == 1000 and \
+           tt[7] == 'tt' and tt[14] == 2 and tt[1] == 'new' and len(tt) == 1001 and \
+           tt.is_owned(7) and not tt.is_owned(14) and t.is_owned(14) and not t.is_owned(7)
+
+def test_4(): # only the path to the written page is copied
+    t = PageTable()
+    t[0] = 'a'
+    t[WIDTH] = 'b'
+    t[1] = 'c'
+    tt = t.copy()
+    tt[WIDTH] = 'd'
+    assert tt._root is not t._root and tt._root.array[1] is t._root.array[1] and t[WIDTH] == 'b'
+
+if __name__ == "__main__":
+    for k, test in enumerate([test_1, test_2, test_3, test_4]):
+        print "- Test " + str(k + 1)
+        try:
+            test()
+        except:
+            print bcolors.FAIL + "  Not passed" + bcolors.ENDC
+            traceback.print_exc(file=sys.stderr)
+            sys.exit(1)
+        print bcolors.OKGREEN + "  Passed" + bcolors.ENDC + "\n"
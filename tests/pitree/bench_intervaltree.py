@@ -0,0 +1,184 @@
+"""
+Benchmark of PersistentIntervalTree, the tree used by the pages of
+pitree: time of add (recursive path copying), and time of update and
+search+find, iterative (memory.lib.pitree.persistent_intervaltree) vs
+the recursive reference implementation kept below.
+
+Usage: python bench_intervaltree.py [trace ...]
+
+A trace is a log in the format read by memory.lib.pitree.parser
+(n,tree / c,src,dst / a,tree,begin,end,data / u,tree,data,newdata /
+s,tree,begin,end). Rounds are ignored. Without traces, a synthetic
+trace (stores on a few hot regions, updates of stored intervals, copies,
+loads mostly on recently stored addresses) is generated.
+"""
+
+import os, sys, time, random, gc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+
+from memory.lib.pitree.persistent_intervaltree import *
+from memory.lib.pitree.parser import parser
+
+
+# ----------------------------------------------------------------------
+# recursive reference implementation (previous version of
+# persistent_intervaltree.py)
+# ----------------------------------------------------------------------
+def _rec_replace(node, old, new):
+    if node is None or node.max < old.end:
+        return None
+    if node.interval is old:
+        return PNode(new, node.left_child, node.right_child)
+    if old.begin <= node.interval.begin:
+        n = _rec_replace(node.left_child, old, new)
+        if n is not None:
+            return PNode(node.interval, n, node.right_child)
+    if old.begin >= node.interval.begin:
+        n = _rec_replace(node.right_child, old, new)
+        if n is not None:
+            return PNode(node.interval, node.left_child, n)
+    return None
+
+
+def _rec_find(node, begin, end):
+    if node is None or node.max < end:
+        return None
+    if node.interval.begin == begin and node.interval.end == end:
+        return node.interval
+    if begin <= node.interval.begin:
+        i = _rec_find(node.left_child, begin, end)
+        if i is not None:
+            return i
+    if begin >= node.interval.begin:
+        return _rec_find(node.right_child, begin, end)
+    return None
+
+
+class RecursivePersistentIntervalTree(PersistentIntervalTree):
+
+    def copy(self):
+        return RecursivePersistentIntervalTree(self.root.child, self.n)
+
+    def update(self, interval, data):
+        i = Interval(interval.begin, interval.end, data)
+        root = _rec_replace(self.root.child, interval, i)
+        assert root is not None
+        self.root.child = root
+        return i
+
+    def find(self, begin, end):
+        return _rec_find(self.root.child, begin, end)
+
+
+# ----------------------------------------------------------------------
+# traces
+# ----------------------------------------------------------------------
+def synthetic_trace(n_ops=200000, seed=0):
+    rnd = random.Random(seed)
+    regions = [0x400000, 0x601000, 0x7ffff000]
+    recent = []
+    stored = {0: []}
+    trees = 1
+    yield ['n', '0']
+    for k in range(n_ops):
+        t = rnd.randrange(trees)
+        r = rnd.random()
+        if k < n_ops / 4 or r < 0.2:
+            base = rnd.choice(regions) + rnd.randint(0, 0x4000)
+            size = rnd.choice([1, 1, 1, 4, 8])
+            recent.append(base)
+            if len(recent) > 64:
+                del recent[0]
+            stored[t].append(k)
+            yield ['a', str(t), str(base), str(base + size), str(k)]
+        elif r < 0.35 and len(stored[t]) > 0:
+            j = rnd.randrange(len(stored[t]))
+            yield ['u', str(t), str(stored[t][j]), str(k)]
+            stored[t][j] = k
+        elif r < 0.3501 and trees < 16:
+            stored[trees] = list(stored[t])
+            yield ['c', str(t), str(trees)]
+            trees += 1
+        else:
+            base = rnd.choice(recent) if rnd.random() < 0.8 else rnd.choice(regions) + rnd.randint(0, 0x4000)
+            yield ['s', str(t), str(base), str(base + rnd.choice([1, 4, 8]))]
+
+
+def read_trace(filename):
+    return parser._read_log_file(filename)
+
+
+# ----------------------------------------------------------------------
+# replay
+# ----------------------------------------------------------------------
+def replay(trace, cls):
+    """
+    Replay a trace on trees of class cls
+    :rtype: (dict, dict, list of lists) - time spent and number of ops by kind (a, u, s), results
+    """
+    trees = {}
+    intervals = {}
+    results = []
+    elapsed = {'a': 0.0, 'u': 0.0, 's': 0.0}
+    count = {'a': 0, 'u': 0, 's': 0}
+    for op in trace:
+        parms = map(lambda i: int(i), op[1:])
+        if op[0] == 'n':
+            trees[parms[0]] = cls()
+            intervals[parms[0]] = {}
+        elif op[0] == 'c':
+            trees[parms[1]] = trees[parms[0]].copy()
+            intervals[parms[1]] = dict(intervals[parms[0]])
+        elif op[0] == 'a':
+            i = Interval(parms[1], parms[2], parms[3])
+            start = time.time()
+            trees[parms[0]].add(i)
+            elapsed['a'] += time.time() - start
+            intervals[parms[0]][parms[3]] = i
+        elif op[0] == 'u':
+            if parms[1] not in intervals[parms[0]]:
+                continue
+            old = intervals[parms[0]].pop(parms[1])
+            start = time.time()
+            i = trees[parms[0]].update(old, parms[2])
+            elapsed['u'] += time.time() - start
+            intervals[parms[0]][parms[2]] = i
+        elif op[0] == 's':
+            t = trees[parms[0]]
+            start = time.time()
+            ris = t.search(parms[1], parms[2])
+            f = t.find(parms[1], parms[2])
+            elapsed['s'] += time.time() - start
+            results.append(sorted((i.begin, i.end, i.data) for i in ris) +
+                           [f is not None and (f.begin, f.end)])
+        else:
+            continue
+        if op[0] in count:
+            count[op[0]] += 1
+    return elapsed, count, results
+
+
+def bench(name, trace):
+    trace = list(trace)
+    gc.collect()
+    t_rec, n, r_rec = replay(trace, RecursivePersistentIntervalTree)
+    gc.collect()
+    t_it, _, r_it = replay(trace, PersistentIntervalTree)
+    assert r_rec == r_it, "results differ"
+    line = name + ": add (%d): %.2f us" % (n['a'], t_it['a'] * 1e6 / n['a'] if n['a'] > 0 else 0)
+    for op, label in (('u', 'update'), ('s', 'search+find')):
+        if n[op] == 0:
+            continue
+        line += " | %s (%d): recursive %.2f us, iterative %.2f us, %.2fx" % (
+            label, n[op], t_rec[op] * 1e6 / n[op], t_it[op] * 1e6 / n[op],
+            t_rec[op] / t_it[op] if t_it[op] > 0 else float('inf'))
+    print line
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        for filename in sys.argv[1:]:
+            bench(filename, read_trace(filename))
+    else:
+        bench("synthetic", synthetic_trace())
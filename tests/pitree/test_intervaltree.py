@@ -96,6 +96,29 @@ def test_12(): # same interval added more than one time
         ris.append(el)
     assert len(ris) == 2 and ris[0] == ris[1] and ris[1] == Interval(1,4)
 
+def test_13(): # search and search_point vs linear search, depths after many adds
+    import random
+    rnd = random.Random(0)
+    it = IntervalTree()
+    for k in range(2000):
+        b = rnd.randint(0, 1000)
+        it.addi(b, b + rnd.randint(1, 20), k)
+    for k in range(200):
+        b = rnd.randint(0, 1000)
+        e = b + rnd.randint(0, 30)
+        assert set(it.search(b, e)) == set(it.linear_search(b, e))
+        assert set(it.search(b)) == set(i for i in it if i.begin < b and i.end >= b)
+    stack = [it.root.child]
+    while stack != []:
+        n = stack.pop()
+        for c, d in ((n.left_child, n.left_depth), (n.right_child, n.right_depth)):
+            if c is None:
+                assert d == 0
+            else:
+                assert d == 1 + max(c.left_depth, c.right_depth)
+                stack.append(c)
+        assert abs(n.balancing_factor) <= 1
+
 if __name__ == "__main__":
     print "- Test 1"
     try:
@@ -203,4 +226,13 @@ if __name__ == "__main__":
         print bcolors.FAIL + "  Not passed" + bcolors.ENDC
         traceback.print_exc(file=sys.stderr)
         sys.exit(1)
-    print bcolors.OKGREEN + "  Passed" + bcolors.ENDC + "\n"
\ No newline at end of file
+    print bcolors.OKGREEN + "  Passed" + bcolors.ENDC + "\n"
+
+    print "- Test 13"
+    try:
+        test_13()
+    except:
+        print bcolors.FAIL + "  Not passed" + bcolors.ENDC
+        traceback.print_exc(file=sys.stderr)
+        sys.exit(1)
+    print bcolors.OKGREEN + "  Passed" + bcolors.ENDC + "\n"
@@ -39,15 +39,14 @@ def test_5(): # TODO improvement: check if the tree is actually shared, in some
     tt.add(2, 30)
     assert t._lazycopy and not tt._lazycopy and t._pages != tt._pages
 
-def test_6(): # same problem as before
+def test_6(): # only the written page is copied, the other one is shared
     t = pitree()
     t.add(1, 20)
     t.add(200, 300)
     tt = t.copy()
     tt.add(2, 30)
     assert t._lazycopy and not tt._lazycopy and t._pages != tt._pages                                                         and \
-           t._pages.root.child.right_child.interval.data.tree == tt._pages.root.child.right_child.interval.data.tree          and \
-           t._pages.root.child.right_child.interval.data.lazycopy and tt._pages.root.child.right_child.interval.data.lazycopy and \
+           t._pages.root.child.right_child.interval.data is tt._pages.root.child.right_child.interval.data                    and \
            t._pages.root.child.interval.data.lazycopy and not tt._pages.root.child.interval.data.lazycopy
 
 def test_7():
@@ -80,6 +79,122 @@ def test_8():
     expected = set([Interval(90, 100)])
     assert ris == expected
 
+def test_9(): # writes after copy are not visible in the other tree
+    t = pitree()
+    for k in range(100):
+        t.add(k * 10, k * 10 + 5, k)
+    tt = t.copy()
+    tt.add(3, 4, 'tt')
+    t.add(7, 8, 't')
+    assert set(i.data for i in t.search(0, 10)) == set([0, 't']) and \
+           set(i.data for i in tt.search(0, 10)) == set([0, 'tt'])
+
+def test_10(): # update after copy is not visible in the other tree
+    t = pitree()
+    t.add(1, 20, 'a')
+    t.add(200, 300, 'b')
+    tt = t.copy()
+    i = tt.search(200, 201).pop()
+    tt.update_item(i, 'c')
+    ttt = tt.copy()
+    ttt.update_item(ttt.search(1, 2).pop(), 'd')
+    assert set(i.data for i in t.search(0, 1000))   == set(['a', 'b']) and \
+           set(i.data for i in tt.search(0, 1000))  == set(['a', 'c']) and \
+           set(i.data for i in ttt.search(0, 1000)) == set(['d', 'c'])
+
+def test_11(): # pow2 paging: same results as span paging, fewer pages with many widths
+    import random
+    rnd = random.Random(0)
+    t = pitree()
+    tt = pitree(paging='pow2')
+    for k in range(2000):
+        b = rnd.randint(0, 1 << 16)
+        e = b + rnd.randint(1, 1 << rnd.randint(0, 12))
+        t.add(b, e, k)
+        tt.add(b, e, k)
+    ttt = tt.copy()
+    for k in range(200):
+        b = rnd.randint(0, 1 << 16)
+        e = b + rnd.randint(1, 64)
+        expected = set(i.data for i in t.search(b, e))
+        assert set(i.data for i in tt.search(b, e)) == expected and \
+               set(i.data for i in ttt.search(b, e)) == expected
+    i = ttt.search(0, 1 << 17).pop()
+    ttt.update_item(i, 'u')
+    assert 'u' in set(i.data for i in ttt.search(i.begin, i.end)) and \
+           'u' not in set(i.data for i in tt.search(0, 1 << 17))
+    assert len(tt._pages) < len(t._pages)
+
+def test_12(): # adaptive page size: wide intervals and searches make the pages grow at copy time
+    t = pitree(page_size=16, adaptive=True)
+    for k in range(300):
+        t.add(k * 100, k * 100 + 90, k)
+    i = t.search(50, 51).pop()
+    for k in range(300):
+        t.search(k * 100, k * 100 + 200)
+    tt = t.copy()
+    assert t._page_size > 16 and tt._page_size == t._page_size and t._pages is tt._pages
+    assert set(j.data for j in tt.search(1000, 1100)) == set([10])
+    assert t.search(50, 51).pop() is i
+    tt.update_item(i, 'u')
+    assert set(j.data for j in tt.search(0, 100)) == set(['u']) and \
+           set(j.data for j in t.search(0, 100)) == set([0])
+
+def test_13(): # single-byte intervals: point index, copy on write and update
+    import random
+    rnd = random.Random(0)
+    t = pitree()
+    intervals = []
+    for k in range(1000):
+        b = rnd.randint(0, 4096)
+        e = b + (1 if k % 2 == 0 else rnd.randint(2, 300))
+        t.add(b, e, k)
+        intervals.append((b, e, k))
+    assert len(t._points) > 0
+    for k in range(300):
+        b = rnd.randint(0, 4096)
+        e = b + rnd.randint(1, 1 << rnd.randint(0, 12))
+        expected = set(d for (ib, ie, d) in intervals if ib < e and ie > b)
+        assert set(i.data for i in t.search(b, e)) == expected
+    b = intervals[0][0]
+    tt = t.copy()
+    tt.add(b, b + 1, 'tt')
+    i = [j for j in t.search(b, b + 1) if j.data == 0].pop()
+    t.update_item(i, 't')
+    assert 'tt' in set(j.data for j in tt.search(b, b + 1)) and 0 in set(j.data for j in tt.search(b, b + 1)) and \
+           't' in set(j.data for j in t.search(b, b + 1)) and 'tt' not in set(j.data for j in t.search(b, b + 1)) and \
+           0 not in set(j.data for j in t.search(b, b + 1))
+
+def test_14(): # path-copying tree: insert, update and find vs linear scan, AVL invariants, versions
+    import random
+    rnd = random.Random(0)
+    t = PersistentIntervalTree()
+    intervals = []
+    for k in range(3000):
+        b = rnd.randint(0, 500) # many intervals with the same begin
+        intervals.append(t.addi(b, b + rnd.randint(1, 20), k))
+    old = t.copy()
+    for k in range(500):
+        i = intervals.pop(rnd.randrange(len(intervals)))
+        assert t.find(i.begin, i.end) is not None
+        intervals.append(t.update(i, -k))
+    assert set(old) != set(t) and set(t) == set(intervals) and len(set(old)) == 3000
+    for k in range(300):
+        b = rnd.randint(0, 520)
+        e = b + rnd.randint(1, 30)
+        assert set(t.search(b, e)) == set(i for i in intervals if i.begin < e and i.end > b)
+        f = t.find(b, e)
+        assert (f is None) == (len([i for i in intervals if i.begin == b and i.end == e]) == 0)
+        assert f is None or (f.begin == b and f.end == e and f in set(intervals))
+    stack = [t.root.child]
+    while stack != []:
+        n = stack.pop()
+        lh = n.left_child.height if n.left_child is not None else 0
+        rh = n.right_child.height if n.right_child is not None else 0
+        assert n.height == 1 + max(lh, rh) and abs(rh - lh) <= 1
+        assert n.max == max([n.interval.end] + [c.max for c in (n.left_child, n.right_child) if c is not None])
+        stack += [c for c in (n.left_child, n.right_child) if c is not None]
+
 if __name__=="__main__":
     print "- Test 1"
     try:
@@ -151,4 +266,58 @@ if __name__=="__main__":
         print bcolors.FAIL + "  Not passed" + bcolors.ENDC
         traceback.print_exc(file=sys.stderr)
         sys.exit(1)
-    print bcolors.OKGREEN + "  Passed" + bcolors.ENDC + "\n"
\ No newline at end of file
+    print bcolors.OKGREEN + "  Passed" + bcolors.ENDC + "\n"
+
+    print "- Test 9"
+    try:
+        test_9()
+    except:
+        print bcolors.FAIL + "  Not passed" + bcolors.ENDC
+        traceback.print_exc(file=sys.stderr)
+        sys.exit(1)
+    print bcolors.OKGREEN + "  Passed" + bcolors.ENDC + "\n"
+
+    print "- Test 10"
+    try:
+        test_10()
+    except:
+        print bcolors.FAIL + "  Not passed" + bcolors.ENDC
+        traceback.print_exc(file=sys.stderr)
+        sys.exit(1)
+    print bcolors.OKGREEN + "  Passed" + bcolors.ENDC + "\n"
+
+    print "- Test 11"
+    try:
+        test_11()
+    except:
+        print bcolors.FAIL + "  Not passed" + bcolors.ENDC
+        traceback.print_exc(file=sys.stderr)
+        sys.exit(1)
+    print bcolors.OKGREEN + "  Passed" + bcolors.ENDC + "\n"
+
+    print "- Test 12"
+    try:
+        test_12()
+    except:
+        print bcolors.FAIL + "  Not passed" + bcolors.ENDC
+        traceback.print_exc(file=sys.stderr)
+        sys.exit(1)
+    print bcolors.OKGREEN + "  Passed" + bcolors.ENDC + "\n"
+
+    print "- Test 13"
+    try:
+        test_13()
+    except:
+        print bcolors.FAIL + "  Not passed" + bcolors.ENDC
+        traceback.print_exc(file=sys.stderr)
+        sys.exit(1)
+    print bcolors.OKGREEN + "  Passed" + bcolors.ENDC + "\n"
+
+    print "- Test 14"
+    try:
+        test_14()
+    except:
+        print bcolors.FAIL + "  Not passed" + bcolors.ENDC
+        traceback.print_exc(file=sys.stderr)
+        sys.exit(1)
+    print bcolors.OKGREEN + "  Passed" + bcolors.ENDC + "\n"
@@ -7,11 +7,28 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from tests.artificial.test_memory import test_symbolic_access, test_store_with_symbolic_size, \
     test_store_with_symbolic_addr_and_symbolic_size, test_concrete_merge, test_concrete_merge_with_condition, \
-    test_symbolic_merge
+    test_concrete_merge_changed_offsets, test_concrete_merge_runs, test_concrete_merge_image, test_n_way_merge, test_symbolic_merge, \
+    test_symbolic_merge_write_log, test_multi_byte_symbolic_store, test_load_cache, test_address_range_cache, \
+    test_interval_bounds, test_guard_interning, test_merge_cost, test_cost_aware_merging, test_profiling, \
+    test_solver_stats, test_telemetry, test_serialization, \
+    test_batch_serialization
 
-from executor import executor
+from executor import executor, parallel
 from memory import factory
 
+
+class FailingExplorer(parallel.ParallelExplorer):
+
+    def _step(self, sm):
+        raise ValueError("step failed")
+
+
+class DyingExplorer(parallel.ParallelExplorer):
+
+    def _step(self, sm):
+        os._exit(3)
+
+
 class TestMemsightMemory(unittest.TestCase):
 
     def common(self, file):
@@ -21,6 +38,13 @@ class TestMemsightMemory(unittest.TestCase):
         mem_memory, reg_memory = factory.get_range_fully_symbolic_memory(angr_project)
         return explorer.run(mem_memory=mem_memory, reg_memory=reg_memory, verbose=False)
 
+    def common_parallel(self, file, workers=2):
+        p = os.path.dirname(os.path.realpath(__file__))
+        explorer = executor.Executor(p + '/binary/' + file)
+        angr_project = explorer.project
+        mem_memory, reg_memory = factory.get_range_fully_symbolic_memory(angr_project)
+        return explorer.run_parallel(mem_memory=mem_memory, reg_memory=reg_memory, verbose=False, workers=workers)
+
     def test_basic_example(self):
         self.assertTrue(self.common('basic-example'))
 
@@ -49,6 +73,26 @@ class TestMemsightMemory(unittest.TestCase):
     def test_merge(self):
         self.assertTrue(self.common('merge'))
 
+    def test_parallel(self):
+        self.assertTrue(self.common_parallel('basic-example'))
+        self.assertTrue(self.common_parallel('fail4'))
+
+    def test_parallel_worker_error(self):
+        p = os.path.dirname(os.path.realpath(__file__))
+        explorer = executor.Executor(p + '/binary/basic-example')
+        mem_memory, reg_memory = factory.get_range_fully_symbolic_memory(explorer.project)
+        pg, data, veritesting, max_rounds = explorer._common_run(mem_memory, reg_memory, False)
+
+        # an exception in a worker is raised by the coordinator, with its traceback
+        with self.assertRaises(RuntimeError) as cm:
+            FailingExplorer(explorer, workers=2).run(pg, veritesting, max_rounds)
+        self.assertIn("step failed", str(cm.exception))
+
+        # so is the death of a worker
+        with self.assertRaises(RuntimeError) as cm:
+            DyingExplorer(explorer, workers=2).run(pg, veritesting, max_rounds)
+        self.assertIn("exit code 3", str(cm.exception))
+
     def test_memory(self):
 
         angr_project = angr.Project("/bin/ls", load_options={'auto_load_libs': False})
@@ -66,9 +110,26 @@ class TestMemsightMemory(unittest.TestCase):
         test_store_with_symbolic_addr_and_symbolic_size(state.copy())
 
         test_concrete_merge(state.copy())
+        test_concrete_merge_changed_offsets(state.copy())
+        test_concrete_merge_runs(state.copy())
+        test_concrete_merge_image(state.copy())
+        test_n_way_merge(state.copy())
+        test_guard_interning(state.copy())
+        test_merge_cost(state.copy())
+        test_cost_aware_merging(state.copy())
         test_concrete_merge_with_condition(state.copy())
 
         test_symbolic_merge(state.copy())
+        test_symbolic_merge_write_log(state.copy())
+        test_multi_byte_symbolic_store(state.copy())
+        test_load_cache(state.copy())
+        test_address_range_cache(state.copy())
+        test_interval_bounds(state.copy())
+        test_profiling(state.copy())
+        test_solver_stats(state.copy())
+        test_telemetry(state.copy())
+        test_serialization(state.copy())
+        test_batch_serialization(state.copy())
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -20,6 +20,15 @@ python $DIR/pitree/test_pitree.py
 echo -e "\n\nTest: intervaltree"
 python $DIR/pitree/test_intervaltree.py
 
+echo -e "\n\nTest: page table"
+python $DIR/paged_memory/test_page_table.py
+
+echo -e "\n\nTest: concrete page"
+python $DIR/paged_memory/test_concrete_page.py
+
+echo -e "\n\nTest: binary image"
+python $DIR/paged_memory/test_binary_image.py
+
 # angr examples
 echo -e "\n\nTest: ais3_crackme"
 python $DIR/angr-examples/ais3_crackme/solve.py